@@ -0,0 +1,452 @@
+import os
+import sys
+import time
+import json
+import random
+import re
+import threading
+import argparse
+import tempfile
+import resource # For the Python process's own peak RSS
+import contextlib
+import functools
+import importlib.util
+from email.parser import BytesParser # For parsing multipart/related Drive uploads
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import httplib2
+from googleapiclient.discovery import build
+
+# --- Benchmark Configuration ---
+SCRAPER_SCRIPT = 'TrackerScraperv1.1.py' # Script under test, loaded from this directory
+DEFAULT_JOBS = 24
+DEFAULT_WORKERS = 4
+DEFAULT_API_LATENCY_MS = 50 # Added to every fake Drive/Sheets response
+DEFAULT_API_ERROR_RATE = 0.0 # Share of fake Drive/Sheets requests answered with 429
+SLOW_PAGE_DELAY_MS = 1500 # How long /slow holds back its HTML (its late assets take as long again)
+TALL_PAGE_HEIGHT = 30000 # CSS px, matching SCREENSHOT_MAX_HEIGHT
+RSS_SAMPLE_INTERVAL = 0.5 # Seconds between process-tree RSS samples
+PAGE_TYPES = ['short', 'tall', 'js-heavy', 'slow'] # Jobs cycle through these synthetic pages
+
+# --- Helper Function: Load the Scraper Script as a Module ---
+def load_scraper(script_dir):
+    """Imports TrackerScraperv1.1.py (whose file name is not a valid module name) and returns the module."""
+    spec = importlib.util.spec_from_file_location('tracker_scraper', os.path.join(script_dir, SCRAPER_SCRIPT))
+    module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)
+    return module
+
+# --- Synthetic Target Pages ---
+def _page(title, body, head=''):
+    return f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{title}</title>{head}<style>body{{font-family:sans-serif;margin:0}} .block{{margin:16px;padding:16px;border:1px solid #ccc}}</style></head><body>{body}</body></html>"
+
+def render_synthetic_page(page_type, version, query):
+    """Returns (status, content_type, body_bytes, delay_seconds) for a synthetic target page."""
+    if page_type == 'short':
+        body = ''.join(f"<p class='block'>Short page v{version}, paragraph {i}.</p>" for i in range(6))
+        return 200, 'text/html', _page('Short', body).encode(), 0
+    if page_type == 'tall':
+        blocks = TALL_PAGE_HEIGHT // 300
+        body = ''.join(f"<div class='block' style='height:250px;background:linear-gradient(90deg,hsl({(i * 37) % 360},60%,80%),#fff)'>Tall page v{version}, block {i} of {blocks}<img loading='lazy' src='/asset?i={i}' width='120' height='80'></div>" for i in range(blocks))
+        return 200, 'text/html', _page('Tall', body).encode(), 0
+    if page_type == 'js-heavy':
+        script = """<script>
+            var root = document.getElementById('root'), batch = 0;
+            function addBatch() {
+                var frag = document.createDocumentFragment(), x = 0;
+                for (var i = 0; i < 500; i++) { for (var k = 0; k < 2000; k++) { x += Math.sqrt(i * k); }
+                    var d = document.createElement('div'); d.className = 'block'; d.textContent = 'Row ' + (batch * 500 + i) + ' ' + (x % 97).toFixed(2); frag.appendChild(d); }
+                root.appendChild(frag); batch += 1;
+                if (batch < 10) setTimeout(addBatch, 100); else fetch('/api/data?delay=300').then(function (r) { return r.text(); }).then(function (t) { document.title = t; });
+            }
+            addBatch();
+        </script>"""
+        return 200, 'text/html', _page('JS heavy', f"<h1>JS heavy v{version}</h1><div id='root'></div>{script}").encode(), 0
+    if page_type == 'slow':
+        delay_ms = int(query.get('delay', [SLOW_PAGE_DELAY_MS])[0])
+        body = f"<h1>Slow page v{version}</h1><img src='/asset?i=slow&delay={delay_ms}' width='300' height='200'><div id='late'></div><script>setTimeout(function () {{ fetch('/api/data?delay={delay_ms}').then(function (r) {{ return r.text(); }}).then(function (t) {{ document.getElementById('late').innerHTML = '<p class=block>' + t + '</p>'.repeat(20); }}); }}, 200);</script>"
+        return 200, 'text/html', _page('Slow', body).encode(), delay_ms / 1000.0
+    return 404, 'text/plain', b'Not found', 0
+
+class SyntheticSiteHandler(BaseHTTPRequestHandler):
+    """Serves /short, /tall, /js-heavy and /slow plus the assets and XHR endpoints they load."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parts = urlsplit(self.path); query = parse_qs(parts.query); version = query.get('v', ['1'])[0]
+        if parts.path == '/asset':
+            delay = int(query.get('delay', ['0'])[0]) / 1000.0
+            body = (f"<svg xmlns='http://www.w3.org/2000/svg' width='120' height='80'><rect width='120' height='80' fill='hsl({sum(map(ord, query.get('i', ['0'])[0])) * 47 % 360},50%,60%)'/></svg>").encode()
+            status, content_type = 200, 'image/svg+xml'
+        elif parts.path == '/api/data':
+            delay = int(query.get('delay', ['0'])[0]) / 1000.0; status, content_type, body = 200, 'text/plain', f"data v{version}".encode()
+        else:
+            status, content_type, body, delay = render_synthetic_page(parts.path.strip('/'), version, query)
+        if delay: time.sleep(delay)
+        self.send_response(status); self.send_header('Content-Type', content_type); self.send_header('Content-Length', str(len(body))); self.send_header('Cache-Control', 'no-store'); self.end_headers(); self.wfile.write(body)
+
+    def log_message(self, *args): pass
+
+# --- Fake Google Drive & Sheets API ---
+_A1_CELL = re.compile(r'^([A-Z]*)(\d*)$')
+
+def _column_index(letters):
+    index = 0
+    for letter in letters: index = index * 26 + (ord(letter) - ord('A') + 1)
+    return index - 1
+
+def parse_a1_range(a1):
+    """Parses 'Tab'!A2:E (or Tab!A1, or 'Tab') into (tab, first_row, last_row, first_col, last_col); bounds may be None."""
+    if '!' in a1: tab, cells = a1.rsplit('!', 1)
+    else: tab, cells = a1, ''
+    if tab.startswith("'") and tab.endswith("'"): tab = tab[1:-1].replace("''", "'")
+    if not cells: return tab, 0, None, 0, None
+    start, _, end = cells.partition(':'); start_col, start_row = _A1_CELL.match(start).groups(); end_col, end_row = _A1_CELL.match(end or start).groups()
+    return (tab, int(start_row) - 1 if start_row else 0, int(end_row) - 1 if end_row else None,
+            _column_index(start_col) if start_col else 0, _column_index(end_col) if end_col else None)
+
+class FakeGoogleApi:
+    """In-memory Drive and Sheets backend with configurable latency and injected 429s."""
+
+    def __init__(self, latency_ms=DEFAULT_API_LATENCY_MS, error_rate=DEFAULT_API_ERROR_RATE, seed=0):
+        self.latency = latency_ms / 1000.0; self.error_rate = error_rate; self._random = random.Random(seed); self._lock = threading.Lock()
+        self.tabs = {}; self.files = {}; self.uploads = {}; self.counters = {}
+
+    def count(self, endpoint, outcome='ok'):
+        with self._lock: entry = self.counters.setdefault(endpoint, {'ok': 0, 'injected_429': 0, 'error': 0}); entry[outcome] += 1
+
+    def should_throttle(self):
+        with self._lock: return self._random.random() < self.error_rate
+
+    def seed_config(self, config_sheet_name, rows):
+        with self._lock: self.tabs[config_sheet_name] = [['url', 'folder_id', 'sheet_name', 'wait_selector', 'max_wait']] + [list(row) for row in rows]
+
+    def read(self, a1):
+        tab, first_row, last_row, first_col, last_col = parse_a1_range(a1)
+        with self._lock:
+            if tab not in self.tabs: return None
+            rows = self.tabs[tab][first_row:None if last_row is None else last_row + 1]
+            values = [row[first_col:None if last_col is None else last_col + 1] for row in rows]
+        while values and not any(values[-1]): values.pop()
+        return values
+
+    def write(self, a1, values):
+        tab, first_row, _, first_col, _ = parse_a1_range(a1)
+        with self._lock:
+            if tab not in self.tabs: return False
+            rows = self.tabs[tab]
+            for offset, row_values in enumerate(values):
+                while len(rows) <= first_row + offset: rows.append([])
+                row = rows[first_row + offset]
+                while len(row) < first_col + len(row_values): row.append('')
+                row[first_col:first_col + len(row_values)] = [str(value) for value in row_values]
+            return True
+
+    def append(self, a1, values):
+        tab = parse_a1_range(a1)[0]
+        with self._lock:
+            if tab not in self.tabs: return None
+            start = len(self.tabs[tab]) + 1; self.tabs[tab].extend([str(value) for value in row] for row in values)
+            return f"'{tab}'!A{start}:C{start + len(values) - 1}"
+
+    def create_file(self, metadata, size):
+        with self._lock:
+            file_id = f"fake{len(self.files) + 1:06d}"; self.files[file_id] = {'name': metadata.get('name'), 'parents': metadata.get('parents'), 'size': size}
+        return {'id': file_id, 'webViewLink': f"https://drive.example.invalid/file/d/{file_id}/view"}
+
+def make_fake_api_handler(api):
+    """Returns a request handler class serving `api` with Google-style routes and JSON error bodies."""
+
+    class FakeGoogleApiHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, status, payload=None, headers=None):
+            body = json.dumps(payload if payload is not None else {}).encode()
+            self.send_response(status); self.send_header('Content-Type', 'application/json; charset=UTF-8'); self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items(): self.send_header(key, value)
+            self.end_headers(); self.wfile.write(body)
+
+        def _error(self, status, message, reason):
+            self._reply(status, {'error': {'code': status, 'message': message, 'errors': [{'reason': reason, 'message': message}]}})
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(length) if length else b''
+
+        def _handle(self, method):
+            parts = urlsplit(self.path); path = parts.path; query = parse_qs(parts.query); body = self._body()
+            endpoint = self._endpoint(method, path, query)
+            if api.latency: time.sleep(api.latency * random.uniform(0.5, 1.5))
+            if endpoint is None: api.count('unknown', 'error'); self._error(404, f"No fake route for {method} {path}", 'notFound'); return
+            if api.should_throttle(): api.count(endpoint, 'injected_429'); self._error(429, 'Rate Limit Exceeded (injected)', 'rateLimitExceeded'); return
+            try: getattr(self, '_' + endpoint.replace('.', '_'))(path, query, body)
+            except Exception as e: api.count(endpoint, 'error'); self._error(500, f"Fake API error: {e}", 'backendError'); return
+            api.count(endpoint)
+
+        def _endpoint(self, method, path, query):
+            if path.startswith('/upload/drive/v3/files'): return 'drive.files.upload_chunk' if 'upload_id' in query else 'drive.files.create'
+            match = re.match(r'^/v4/spreadsheets/[^/:]+(.*)$', path)
+            if not match: return None
+            rest = match.group(1)
+            if rest == '' and method == 'GET': return 'sheets.spreadsheets.get'
+            if rest == ':batchUpdate': return 'sheets.spreadsheets.batchUpdate'
+            if rest == '/values:batchGet': return 'sheets.values.batchGet'
+            if rest == '/values:batchUpdate': return 'sheets.values.batchUpdate'
+            if rest.startswith('/values/') and rest.endswith(':append'): return 'sheets.values.append'
+            if rest.startswith('/values/'): return 'sheets.values.get' if method == 'GET' else 'sheets.values.update'
+            return None
+
+        def _range_from_path(self, path):
+            return unquote(path.split('/values/', 1)[1].rsplit(':append', 1)[0])
+
+        # --- Drive ---
+        def _drive_files_create(self, path, query, body):
+            upload_type = query.get('uploadType', [''])[0]
+            if upload_type == 'resumable':
+                upload_id = f"up{len(api.uploads) + 1:06d}"; api.uploads[upload_id] = {'metadata': json.loads(body or b'{}'), 'received': 0}
+                host = self.headers.get('Host'); self._reply(200, {}, {'Location': f"http://{host}/upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}"}); return
+            if upload_type == 'multipart':
+                message = BytesParser().parsebytes(b'Content-Type: ' + self.headers.get('Content-Type', '').encode() + b'\r\n\r\n' + body)
+                parts = message.get_payload(); metadata = json.loads(parts[0].get_payload()); size = len(parts[1].get_payload(decode=True) or b'')
+            else: metadata = {}; size = len(body)
+            self._reply(200, api.create_file(metadata, size))
+
+        def _drive_files_upload_chunk(self, path, query, body):
+            session = api.uploads.get(query['upload_id'][0])
+            if session is None: self._error(404, 'Unknown upload session', 'notFound'); return
+            session['received'] += len(body); total = (self.headers.get('Content-Range') or '').rsplit('/', 1)[-1]
+            if total not in ('*', '') and session['received'] >= int(total): self._reply(200, api.create_file(session['metadata'], session['received']))
+            else:
+                self.send_response(308)
+                if session['received']: self.send_header('Range', f"bytes=0-{session['received'] - 1}") # Omitted while nothing is stored, as Drive does
+                self.send_header('Content-Length', '0'); self.end_headers()
+
+        # --- Sheets ---
+        def _sheets_spreadsheets_get(self, path, query, body):
+            with api._lock: titles = list(api.tabs)
+            self._reply(200, {'sheets': [{'properties': {'title': title}} for title in titles]})
+
+        def _sheets_spreadsheets_batchUpdate(self, path, query, body):
+            replies = []
+            for request in json.loads(body).get('requests', []):
+                title = request.get('addSheet', {}).get('properties', {}).get('title')
+                with api._lock:
+                    if title in api.tabs: raise ValueError(f"A sheet with the name '{title}' already exists.")
+                    if title: api.tabs[title] = []
+                replies.append({'addSheet': {'properties': {'title': title}}})
+            self._reply(200, {'replies': replies})
+
+        def _sheets_values_get(self, path, query, body):
+            a1 = self._range_from_path(path); values = api.read(a1)
+            if values is None: self._error(400, f"Unable to parse range: {a1}", 'badRequest'); return
+            self._reply(200, {'range': a1, 'values': values} if values else {'range': a1})
+
+        def _sheets_values_batchGet(self, path, query, body):
+            value_ranges = []
+            for a1 in query.get('ranges', []):
+                values = api.read(a1)
+                if values is None: self._error(400, f"Unable to parse range: {a1}", 'badRequest'); return
+                value_ranges.append({'range': a1, 'values': values} if values else {'range': a1})
+            self._reply(200, {'valueRanges': value_ranges})
+
+        def _sheets_values_update(self, path, query, body):
+            a1 = self._range_from_path(path)
+            if not api.write(a1, json.loads(body).get('values', [])): self._error(400, f"Unable to parse range: {a1}", 'badRequest'); return
+            self._reply(200, {'updatedRange': a1})
+
+        def _sheets_values_batchUpdate(self, path, query, body):
+            for data in json.loads(body).get('data', []):
+                if not api.write(data['range'], data.get('values', [])): self._error(400, f"Unable to parse range: {data['range']}", 'badRequest'); return
+            self._reply(200, {})
+
+        def _sheets_values_append(self, path, query, body):
+            a1 = self._range_from_path(path); updated = api.append(a1, json.loads(body).get('values', []))
+            if updated is None: self._error(400, f"Unable to parse range: {a1}", 'badRequest'); return
+            self._reply(200, {'updates': {'updatedRange': updated}})
+
+        def do_GET(self): self._handle('GET')
+        def do_POST(self): self._handle('POST')
+        def do_PUT(self): self._handle('PUT')
+        def log_message(self, *args): pass
+
+    return FakeGoogleApiHandler
+
+# --- Helper Class: HTTP Transport That Keeps Local Stand-Ins on Plain HTTP ---
+class LocalHttp(httplib2.Http):
+    """googleapiclient rewrites media-upload URLs to https on the api_endpoint's host; this sends them over http instead.
+
+    Like googleapiclient.http.build_http, 308 is not followed as a redirect: resumable uploads use it for "resume incomplete".
+    """
+
+    def __init__(self, local_netloc, **kwargs):
+        super().__init__(**kwargs); self.local_netloc = local_netloc; self.redirect_codes = self.redirect_codes - {308}
+
+    def request(self, uri, *args, **kwargs):
+        if uri.startswith(f"https://{self.local_netloc}/"): uri = 'http://' + uri[len('https://'):]
+        return super().request(uri, *args, **kwargs)
+
+# --- Helper Function: Start a Threaded HTTP Server in the Background ---
+def start_server(handler_class):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class); server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=handler_class.__name__, daemon=True).start()
+    return server
+
+# --- Helper Class: Peak RSS Sampler for This Process and Its Children (Chrome) ---
+class RssSampler:
+    """Samples the summed RSS of this process and all its descendants (chromedriver, Chrome) from /proc."""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval; self.peak_tree_bytes = 0; self._stop = threading.Event(); self._thread = None
+        self.supported = os.path.isdir('/proc/self')
+
+    def _tree_rss(self):
+        page_size = os.sysconf('SC_PAGE_SIZE'); parents = {}; rss = {}
+        for pid in filter(str.isdigit, os.listdir('/proc')):
+            try:
+                with open(f'/proc/{pid}/stat') as f: fields = f.read().rsplit(')', 1)[1].split()
+                parents[int(pid)] = int(fields[1]); rss[int(pid)] = int(fields[21]) * page_size
+            except (OSError, IndexError, ValueError): continue
+        tree = {os.getpid()}; grew = True
+        while grew:
+            grew = False
+            for pid, parent in parents.items():
+                if parent in tree and pid not in tree: tree.add(pid); grew = True
+        return sum(rss.get(pid, 0) for pid in tree)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_tree_bytes = max(self.peak_tree_bytes, self._tree_rss()); self._stop.wait(self.interval)
+
+    def start(self):
+        if self.supported: self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True); self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join()
+
+def self_peak_rss_bytes():
+    """Peak RSS of this Python process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+# --- Benchmark Run ---
+def run_benchmark(jobs=DEFAULT_JOBS, workers=DEFAULT_WORKERS, latency_ms=DEFAULT_API_LATENCY_MS, error_rate=DEFAULT_API_ERROR_RATE, change_detection=False, html_archive_mode='full', scraper_log=None, seed=0):
+    """Runs the scraper's main() end to end against local pages and the fake API. Returns the report dict."""
+    script_dir = os.path.dirname(os.path.abspath(__file__)); scraper = load_scraper(script_dir)
+    work_dir = tempfile.mkdtemp(prefix='trackerscraper_bench_')
+    site = start_server(SyntheticSiteHandler); api = FakeGoogleApi(latency_ms=latency_ms, error_rate=error_rate, seed=seed); api_server = start_server(make_fake_api_handler(api))
+    site_url = f"http://127.0.0.1:{site.server_address[1]}"; api_netloc = f"127.0.0.1:{api_server.server_address[1]}"
+
+    job_types = {}; rows = []
+    for i in range(jobs):
+        page_type = PAGE_TYPES[i % len(PAGE_TYPES)]; url = f"{site_url}/{page_type}?job={i}"; job_types[url] = page_type
+        rows.append([url, f"folder-{page_type}", f"Bench-{page_type}-{i}"])
+    api.seed_config(scraper.CONFIG_SHEET_NAME, rows)
+
+    # Point the scraper at the stand-ins and keep its local state out of the repository.
+    def build_local_services(creds, quiet=False):
+        drive = build('drive', 'v3', http=LocalHttp(api_netloc), client_options={'api_endpoint': f"http://{api_netloc}/drive/v3/"}, cache_discovery=False)
+        sheets = build('sheets', 'v4', http=LocalHttp(api_netloc), client_options={'api_endpoint': f"http://{api_netloc}/"}, cache_discovery=False)
+        return drive, sheets
+    scraper.get_credentials = lambda: object(); scraper.build_google_services = build_local_services
+    metrics_file = os.path.join(work_dir, 'run_metrics.jsonl'); index_db = os.path.join(work_dir, 'capture_index.sqlite3') # Constructor defaults are bound at import, so wrap the classes
+    scraper.RunMetrics = functools.partial(scraper.RunMetrics, metrics_file=metrics_file, prometheus_textfile=None)
+    scraper.SheetRowBuffer = functools.partial(scraper.SheetRowBuffer, journal_path=os.path.join(work_dir, 'pending_sheet_rows.jsonl'))
+    scraper.CaptureIndex = functools.partial(scraper.CaptureIndex, db_path=index_db); scraper.HtmlArchive = functools.partial(scraper.HtmlArchive, db_path=index_db)
+    scraper.LOCAL_SAVE_DIR = os.path.join(work_dir, 'captures')
+
+    try: scraper.create_chrome_driver().quit() # Fail fast: without Chrome every job would just come back 'partial'
+    except Exception as e:
+        site.shutdown(); api_server.shutdown()
+        raise SystemExit(f"Benchmark needs a working Chrome/chromedriver: {e}")
+
+    print(f"Benchmark: {jobs} jobs ({', '.join(PAGE_TYPES)}), {workers} worker(s), API latency {latency_ms}ms, 429 rate {error_rate:.0%}")
+    print(f"Synthetic site: {site_url} | Fake Google API: http://{api_netloc} | Work dir: {work_dir}")
+    sampler = RssSampler(); sampler.start(); start = time.time()
+    log_file = open(scraper_log, 'w', encoding='utf-8') if scraper_log else open(os.devnull, 'w')
+    try:
+        with contextlib.redirect_stdout(log_file):
+            scraper.main(max_workers=workers, change_detection=change_detection, html_archive_mode=html_archive_mode)
+    finally:
+        wall = time.time() - start; sampler.stop(); log_file.close(); site.shutdown(); api_server.shutdown()
+
+    records = []
+    if os.path.exists(metrics_file):
+        with open(metrics_file, encoding='utf-8') as f: records = [json.loads(line) for line in f if line.strip()]
+    return build_report(records, job_types, wall, workers, api, sampler, latency_ms, error_rate, scraper)
+
+def build_report(records, job_types, wall, workers, api, sampler, latency_ms, error_rate, scraper):
+    job_records = [r for r in records if r.get('type') == 'job']; run_record = next((r for r in records if r.get('type') == 'run'), {})
+    durations = [r['duration'] for r in job_records if r.get('status') != 'skipped']
+    by_type = {}
+    for r in job_records: by_type.setdefault(job_types.get(r.get('url'), 'other'), []).append(r['duration'])
+    phases = {}
+    for r in job_records:
+        for name, seconds in r.get('phases', {}).items(): phases.setdefault(name, []).append(seconds)
+    statuses = {}
+    for r in job_records: statuses[r.get('status')] = statuses.get(r.get('status'), 0) + 1
+    capture_peaks = {} # Largest per-capture memory peaks, by page type (see SCREENSHOT_OUTPUT_MODE)
+    for r in job_records:
+        for name, value in r.get('peaks', {}).items():
+            page_peaks = capture_peaks.setdefault(job_types.get(r.get('url'), 'other'), {}); page_peaks[name] = max(page_peaks.get(name, 0), value)
+
+    def distribution(values):
+        return {key: scraper.percentile(values, pct) for key, pct in (('p50', 50), ('p90', 90), ('p95', 95), ('p99', 99), ('max', 100))} if values else {}
+
+    return {
+        'config': {'jobs': len(job_types), 'workers': workers, 'api_latency_ms': latency_ms, 'api_error_rate': error_rate},
+        'wall_seconds': round(wall, 3), 'jobs_per_minute': round(len(durations) * 60.0 / wall, 2) if wall > 0 else None,
+        'statuses': statuses, 'job_latency': distribution(durations),
+        'job_latency_by_page': {page_type: distribution(values) for page_type, values in sorted(by_type.items())},
+        'phases': {name: {'p50': scraper.percentile(values, 50), 'p95': scraper.percentile(values, 95)} for name, values in sorted(phases.items())},
+        'peak_rss_bytes': {'python': self_peak_rss_bytes(), 'process_tree': sampler.peak_tree_bytes if sampler.supported else None},
+        'capture_peaks': {page_type: peaks for page_type, peaks in sorted(capture_peaks.items())},
+        'api_server': api.counters, 'api_client': run_record.get('api', {}), 'sheets_flush_seconds': run_record.get('phases', {}).get('sheets_flush'),
+    }
+
+# --- Report Output ---
+def print_report(report, baseline=None):
+    def fmt(value): return '-' if value is None else f"{value:.2f}"
+    def change(path):
+        if not baseline: return ''
+        old = baseline; new = report
+        for key in path: old = (old or {}).get(key); new = (new or {}).get(key)
+        if not old or new is None: return ''
+        return f"  ({(new - old) * 100.0 / old:+.1f}% vs baseline)"
+
+    print("\n==================== Benchmark Report ====================")
+    print(f"Jobs/minute: {fmt(report['jobs_per_minute'])}{change(['jobs_per_minute'])} | Wall: {report['wall_seconds']:.1f}s | Statuses: {report['statuses']}")
+    latency = report['job_latency']
+    print(f"Job latency (s): p50 {fmt(latency.get('p50'))}{change(['job_latency', 'p50'])}, p90 {fmt(latency.get('p90'))}, p95 {fmt(latency.get('p95'))}{change(['job_latency', 'p95'])}, p99 {fmt(latency.get('p99'))}, max {fmt(latency.get('max'))}")
+    for page_type, dist in report['job_latency_by_page'].items(): print(f"  {page_type:<10} p50 {fmt(dist.get('p50'))}  p95 {fmt(dist.get('p95'))}  max {fmt(dist.get('max'))}")
+    print(f"{'Phase':<18}{'p50 (s)':>10}{'p95 (s)':>10}")
+    for name, stats in report['phases'].items(): print(f"{name:<18}{fmt(stats['p50']):>10}{fmt(stats['p95']):>10}")
+    rss = report['peak_rss_bytes']; tree = rss['process_tree']
+    print(f"Peak RSS: Python {rss['python'] / 1048576:.0f} MiB{change(['peak_rss_bytes', 'python'])}" + (f", process tree incl. Chrome {tree / 1048576:.0f} MiB{change(['peak_rss_bytes', 'process_tree'])}" if tree else ''))
+    for page_type, peaks in report.get('capture_peaks', {}).items(): print(f"  {page_type:<10} " + ", ".join(f"{name} {value / 1048576:.0f} MiB" for name, value in sorted(peaks.items())))
+    print(f"API client: {report['api_client']} | Sheets flush: {fmt(report['sheets_flush_seconds'])}s")
+    print("Fake API requests: " + ", ".join(f"{name} {counts['ok']} ok/{counts['injected_429']} 429/{counts['error']} err" for name, counts in sorted(report['api_server'].items())))
+    print("==========================================================")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline benchmark: runs the scraper against local synthetic pages and a fake Drive/Sheets API.")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help=f"Number of CONFIG rows to generate (default: {DEFAULT_JOBS}).")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f"Scraper worker count (default: {DEFAULT_WORKERS}).")
+    parser.add_argument('--api-latency-ms', type=int, default=DEFAULT_API_LATENCY_MS, help="Latency added to each fake API response.")
+    parser.add_argument('--api-error-rate', type=float, default=DEFAULT_API_ERROR_RATE, help="Share of fake API requests answered with 429 (0-1).")
+    parser.add_argument('--change-detection', action='store_true', help="Leave change detection on (off by default so every job uploads).")
+    parser.add_argument('--html-archive', choices=['full', 'delta'], default='full', help="HTML archive mode to benchmark.")
+    parser.add_argument('--scraper-log', metavar='PATH', help="Write the scraper's console output here instead of discarding it.")
+    parser.add_argument('--json-out', metavar='PATH', help="Write the report as JSON (commit it to track results over time).")
+    parser.add_argument('--baseline', metavar='PATH', help="Earlier --json-out report to compare against.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for 429 injection.")
+    args = parser.parse_args()
+
+    report = run_benchmark(jobs=args.jobs, workers=args.workers, latency_ms=args.api_latency_ms, error_rate=args.api_error_rate, change_detection=args.change_detection, html_archive_mode=args.html_archive, scraper_log=args.scraper_log, seed=args.seed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f: baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f: json.dump(report, f, indent=2)
+        print(f"Report written to {args.json_out}")
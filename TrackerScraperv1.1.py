@@ -3,6 +3,20 @@ import time
 from datetime import datetime
 import re # Import regular expression module for sanitizing filenames
 import base64 # May be needed for some CDP methods if used later
+import json # For parsing Chrome performance-log (CDP Network) events
+import random # For jittered API retry backoff
+import hashlib # For content hashes used by change detection
+import sqlite3 # For the persistent change-detection index
+import gzip # Fallback codec for HTML archive bundles
+import contextlib # For per-phase timing context managers
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # For the optional Prometheus metrics endpoint
+import threading # For the shared browser pool and per-worker Google clients
+import argparse # For command-line options such as --workers
+import heapq # For the daemon-mode job schedule
+import signal # For stopping daemon mode cleanly on SIGTERM/SIGINT
+from collections import deque # For the bounded daemon-mode metrics window
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED # For concurrent job execution
+from urllib.parse import urlsplit # For deriving origins when clearing browser storage
 
 # --- Selenium Imports ---
 from selenium import webdriver
@@ -17,10 +31,17 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload
 
 # --- Image Conversion ---
-from PIL import Image # For converting PNG to JPG
+from PIL import Image, features as pil_features # For converting PNG to JPG, stitching tiled captures, thumbnails and WebP
+import io # For in-memory image buffers
+
+# --- Optional Compression ---
+try: import zstandard # Preferred codec for HTML archive bundles (pip install zstandard); gzip is used without it
+except ImportError: zstandard = None
+try: import resource # Peak-RSS fallback where /proc is unavailable (not on Windows)
+except ImportError: resource = None
 
 # --- Configuration Source ---
 CONFIG_SPREADSHEET_ID = '19pnGhmC1CXEN9RtXhs64ahvFcggW18S9ZUZyos1T3Lw' # Fixed Sheet ID for config
@@ -36,12 +57,116 @@ CREDENTIALS_FILE = 'credentials.json'
 TOKEN_FILE = 'token.json'
 
 # --- Other Configuration ---
-LOCAL_SAVE_DIR = 'temp_web_captures'
+LOCAL_SAVE_DIR = 'temp_web_captures' # Only used when large captures spill to disk; may point at tmpfs or be set to None
 RUN_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# --- Concurrency Configuration ---
+MAX_WORKERS = 1 # Number of jobs processed at once (overridable with --workers); 1 keeps the original sequential behaviour
+
+# --- Browser Pool Configuration ---
+BROWSER_POOL_SIZE = 1 # Number of long-lived headless Chrome instances kept warm for the run (raised to the worker count when concurrent)
+BROWSER_MAX_PAGES_PER_DRIVER = 50 # A driver is quit and replaced after this many pages to limit memory growth
+BROWSER_PAGE_LOAD_TIMEOUT = 60 # Seconds before driver.get() gives up; a timed-out driver is recycled
+INITIAL_WINDOW_WIDTH = 1366
+INITIAL_WINDOW_HEIGHT = 1080
+
+# --- Page Readiness Configuration ---
+PAGE_READY_MAX_WAIT = 10 # Upper bound (seconds) on waiting for a page to settle; overridable per job via the CONFIG 'max_wait' column
+PAGE_READY_POLL_INTERVAL = 0.25 # Seconds between readiness polls
+PAGE_READY_NETWORK_QUIET = 0.5 # Seconds without network activity before the page counts as network-idle
+PAGE_READY_MAX_INFLIGHT_REQUESTS = 2 # In-flight requests tolerated when idle (long-polls, analytics beacons)
+PAGE_READY_STABLE_POLLS = 3 # Consecutive polls with an unchanged scrollHeight before the layout counts as stable
+LAYOUT_SETTLE_MAX_WAIT = 2 # Upper bound (seconds) on waiting for re-layout after a window resize
+
+# --- Screenshot Configuration ---
+SCREENSHOT_CAPTURE_MODE = 'cdp' # 'cdp' = Page.captureScreenshot straight to JPEG; 'resize' = legacy window-resize + PNG conversion
+SCREENSHOT_MAX_HEIGHT = 30000 # Pages taller than this (CSS px) are cut off
+SCREENSHOT_JPEG_QUALITY = 85
+SCREENSHOT_PRELOAD_LAZY_CONTENT = True # Scroll through the page before a CDP capture so lazy-loaded images render
+CDP_SINGLE_SHOT_MAX_HEIGHT = 16384 # Chrome's maximum texture height; taller pages are captured in tiles and stitched
+CDP_TILE_HEIGHT = 4096 # Height (CSS px) of each tile for tiled captures
+CAPTURE_RSS_SAMPLE_INTERVAL = 0.05 # Seconds between RSS samples while a screenshot is captured and processed
+
+# --- Screenshot Output Configuration ---
+SCREENSHOT_OUTPUT_MODE = 'single' # 'single' = one full-page JPEG; 'segments' = one JPEG per SCREENSHOT_SEGMENT_HEIGHT slice, never decoding the whole page (lowest memory); 'both'
+SCREENSHOT_SEGMENT_HEIGHT = 4096 # Height (px) of each segment, and of the strips used to flatten legacy PNG captures
+SCREENSHOT_THUMBNAIL_WIDTH = None # e.g. 320 to also upload a downscaled JPEG thumbnail (decoded at reduced scale, so it costs little memory)
+SCREENSHOT_WEBP = False # Also upload WebP copies (WebP is limited to 16383px high, so taller single images are skipped; segments always fit)
+SCREENSHOT_WEBP_QUALITY = 80
+WEBP_MAX_DIMENSION = 16383
+
+# --- Upload Configuration ---
+DRIVE_RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024 # Captures up to this size go up in one multipart request; larger ones use a resumable session
+SPILL_LARGE_CAPTURES_TO_DISK = False # Opt-in: write captures above SPILL_TO_DISK_THRESHOLD to LOCAL_SAVE_DIR and upload from there
+SPILL_TO_DISK_THRESHOLD = 64 * 1024 * 1024 # Bytes
+
+# --- Google API Rate Limiting & Retry Configuration ---
+API_RATE_LIMITS = { # Token buckets: (sustained requests per second, burst size)
+    'drive': (3.0, 10), # Drive sustains roughly 3 file writes/second per user
+    'sheets_read': (1.0, 10), # Sheets allows 60 read requests/minute/user
+    'sheets_write': (1.0, 10), # Sheets allows 60 write requests/minute/user
+}
+API_RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+API_RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded') # 403 reasons that are really throttling
+API_MAX_ATTEMPTS = 6 # Attempts per call, including the first
+API_BACKOFF_BASE = 1.0 # Seconds; the backoff ceiling doubles per retry (full jitter)
+API_BACKOFF_MAX = 64.0 # Seconds
+API_DEFAULT_RETRY_BUDGET = 50 # Retries allowed per endpoint per run (per API_RETRY_BUDGET_WINDOW in daemon mode), so a dead API cannot stall the whole run
+API_RETRY_BUDGET_WINDOW = 3600 # Daemon mode: seconds after which retry budgets are refilled and the window's API counters are printed
+API_RETRY_BUDGETS = {'drive.files.create': 100, 'sheets.values.append': 50, 'sheets.values.get': 20, 'sheets.spreadsheets.get': 20}
+
+# --- Change Detection Configuration ---
+CHANGE_DETECTION_ENABLED = True # Skip uploads when a page is unchanged since its last uploaded capture (disable with --no-change-detection)
+CHANGE_INDEX_DB = 'capture_index.sqlite3' # SQLite index of the last uploaded capture's hashes per CONFIG URL
+IMAGE_HASH_SIZE = 16 # Difference-hash grid width; the grid gets IMAGE_HASH_SIZE rows per page-width of height, so tall pages keep detail
+IMAGE_HASH_CHANGE_THRESHOLD = 10 # Screenshots whose hashes differ in at most this many bits count as unchanged
+LOG_UNCHANGED_ROWS = True # Log a compact 'Unchanged' row (linking the previous capture) when the upload is skipped
+UNCHANGED_MARKER = 'Unchanged'
+HTML_NORMALIZATION_RULES = [ # (pattern, replacement) applied in order before hashing HTML, to strip dynamic noise
+    (r'<iframe\b[^>]*(?:doubleclick|googlesyndication|adservice|amazon-adsystem|adnxs|taboola|outbrain)[^>]*>.*?</iframe>', ''), # Ad iframes
+    (r'\snonce="[^"]*"', ''), # CSP nonces
+    (r'(?:csrf|xsrf|authenticity)[_-]?token[\'"]?\s*(?:[:=]|content=)\s*[\'"][^\'"]*[\'"]', ''), # Anti-forgery tokens
+    (r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?', '<timestamp>'), # ISO timestamps
+    (r'\b1\d{9}(?:\d{3})?\b', '<epoch>'), # Unix timestamps in seconds or milliseconds
+    (r'\s+', ' '), # Whitespace runs
+]
+
+# --- HTML Archive Configuration ---
+HTML_ARCHIVE_MODE = 'full' # 'full' = upload page source as plain .html; 'delta' = compressed snapshot/delta bundles (see rebuild_html_from_drive)
+HTML_ARCHIVE_SNAPSHOT_EVERY = 24 # In 'delta' mode, store a full snapshot every N captures of a URL and deltas in between
+HTML_ARCHIVE_MAX_DELTA_RATIO = 0.5 # Store a full snapshot instead when the compressed delta is larger than this share of it
+HTML_DELTA_BLOCK_TOKENS = 4 # A copy can only start where this many consecutive tokens match the previous capture
+HTML_ARCHIVE_FORMAT = 'trackerscraper-html-archive'
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 9
+
+# --- Metrics Configuration ---
+METRICS_FILE = 'run_metrics.jsonl' # One JSON line per job (and one per run) with phase timings and byte counts; None disables
+PROMETHEUS_TEXTFILE = None # e.g. 'trackerscraper.prom' for the node_exporter textfile collector; written at the end of each run
+METRICS_PORT = None # Serve Prometheus text on http://127.0.0.1:<port>/metrics while running (overridable with --metrics-port)
+
+# --- Sheets Batching Configuration ---
+SHEETS_FLUSH_EVERY_ROWS = 50 # Buffered log rows are written once this many are pending, and always at the end of the run
+SHEETS_JOURNAL_FILE = 'pending_sheet_rows.jsonl' # Crash-safe journal of log rows not yet written to Sheets (replayed on the next run)
+
+# --- Daemon Mode Configuration ---
+DEFAULT_JOB_INTERVAL = 24 * 3600 # Seconds between captures of a URL in daemon mode when its CONFIG 'interval' column is empty
+MIN_JOB_INTERVAL = 60 # Shorter CONFIG intervals are raised to this
+CONFIG_SYNC_INTERVAL = 300 # Seconds between CONFIG re-reads in daemon mode; jobs are only re-parsed when the tab's content hash changes
+SCHEDULER_STARTUP_SPREAD = 3600 # New jobs (and all jobs at startup, unless recently captured) are spread over up to this many seconds
+SCHEDULER_STATE_FILE = 'scheduler_state.json' # Last start time per job, so a restarted daemon keeps each URL's cadence
+METRICS_WINDOW_JOBS = 1000 # In daemon mode, p50/p95 phase stats cover the most recent N jobs (counters and totals stay cumulative)
+
 # --- Helper Function: Google Authentication (Handles Both Drive & Sheets) ---
 def get_authenticated_services():
     """Authenticates and returns Google Drive and Sheets service objects."""
+    creds = get_credentials()
+    if not creds: return None, None
+    return build_google_services(creds)
+
+# --- Helper Function: Load, Refresh or Obtain OAuth Credentials ---
+def get_credentials():
+    """Returns valid OAuth credentials for Drive & Sheets, running the browser flow if needed. None on failure."""
     creds = None
     if os.path.exists(TOKEN_FILE):
         try:
@@ -70,7 +195,7 @@ def get_authenticated_services():
         if not creds:
             if not os.path.exists(CREDENTIALS_FILE):
                 print(f"ERROR: Credentials file '{CREDENTIALS_FILE}' not found.")
-                return None, None
+                return None
             try:
                 print(f"Performing new authentication (Scopes: {SCOPES})...")
                 flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
@@ -81,12 +206,16 @@ def get_authenticated_services():
                 print(f"Authentication successful. Credentials saved to {TOKEN_FILE}")
             except Exception as e:
                 print(f"Error during authentication flow: {e}")
-                return None, None
+                return None
+    return creds
 
+# --- Helper Function: Build Google Service Objects from Credentials ---
+def build_google_services(creds, quiet=False):
+    """Builds Google Drive and Sheets service objects. Each call gets its own HTTP transport."""
     try:
-        drive_service = build('drive', 'v3', credentials=creds)
-        sheets_service = build('sheets', 'v4', credentials=creds)
-        print("Google Drive and Sheets services created successfully.")
+        drive_service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+        sheets_service = build('sheets', 'v4', credentials=creds, cache_discovery=False)
+        if not quiet: print("Google Drive and Sheets services created successfully.")
         return drive_service, sheets_service
     except HttpError as error:
         print(f'An error occurred building Google services: {error}')
@@ -95,6 +224,459 @@ def get_authenticated_services():
          print(f"An unexpected error occurred building services: {e}")
          return None, None
 
+# --- Helper Class: Token Bucket Rate Limiter ---
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate); self.capacity = float(capacity); self._tokens = float(capacity); self._updated = time.monotonic(); self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes one token, sleeping until one is available. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic(); self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate); self._updated = now
+                if self._tokens >= 1: self._tokens -= 1; return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay); waited += delay
+
+# --- Helper Class: Google API Call Counters ---
+class ApiCallStats:
+    """Per-endpoint counters of calls, throttling, retries, failures and remaining retry budget."""
+
+    COUNTERS = ('calls', 'throttled', 'retried', 'failed')
+
+    def __init__(self):
+        self._lock = threading.Lock(); self._endpoints = {}; self._window_base = {} # Counter values at the start of the current budget window
+
+    def _entry(self, endpoint):
+        if endpoint not in self._endpoints: self._endpoints[endpoint] = {'calls': 0, 'throttled': 0, 'retried': 0, 'failed': 0, 'retries_left': API_RETRY_BUDGETS.get(endpoint, API_DEFAULT_RETRY_BUDGET)}
+        return self._endpoints[endpoint]
+
+    def record(self, endpoint, counter, amount=1):
+        with self._lock: self._entry(endpoint)[counter] += amount
+
+    def take_retry(self, endpoint):
+        """Consumes one retry from the endpoint's budget. Returns False once the budget is spent."""
+        with self._lock:
+            entry = self._entry(endpoint)
+            if entry['retries_left'] <= 0: return False
+            entry['retries_left'] -= 1; entry['retried'] += 1; return True
+
+    def totals(self):
+        with self._lock: return {key: sum(entry[key] for entry in self._endpoints.values()) for key in self.COUNTERS}
+
+    def start_window(self):
+        """Refills every endpoint's retry budget and returns {endpoint: counters} for the window that just ended.
+        One-shot runs use a single window; daemon mode starts a new one every API_RETRY_BUDGET_WINDOW seconds."""
+        with self._lock:
+            window = {}
+            for name, entry in self._endpoints.items():
+                base = self._window_base.get(name, {}); window[name] = {key: entry[key] - base.get(key, 0) for key in self.COUNTERS}
+                entry['retries_left'] = API_RETRY_BUDGETS.get(name, API_DEFAULT_RETRY_BUDGET); self._window_base[name] = {key: entry[key] for key in self.COUNTERS}
+            return window
+
+    @staticmethod
+    def print_window(window, label):
+        active = {name: counts for name, counts in window.items() if counts['calls'] or counts['failed']}
+        if not active: return
+        totals = {key: sum(counts[key] for counts in active.values()) for key in ApiCallStats.COUNTERS}
+        print(f"Google API calls {label}: {totals['calls']} | Throttled: {totals['throttled']} | Retried: {totals['retried']} | Failed: {totals['failed']}")
+        for name in sorted(active):
+            counts = active[name]
+            if counts['throttled'] or counts['retried'] or counts['failed']: print(f"  {name}: calls {counts['calls']}, throttled {counts['throttled']}, retried {counts['retried']}, failed {counts['failed']}")
+
+    def print_summary(self):
+        with self._lock: endpoints = {name: dict(entry) for name, entry in self._endpoints.items()}
+        if not endpoints: return
+        totals = self.totals()
+        print(f"Google API calls: {totals['calls']} | Throttled: {totals['throttled']} | Retried: {totals['retried']} | Failed: {totals['failed']}")
+        for name in sorted(endpoints):
+            entry = endpoints[name]
+            if entry['throttled'] or entry['retried'] or entry['failed']: print(f"  {name}: calls {entry['calls']}, throttled {entry['throttled']}, retried {entry['retried']}, failed {entry['failed']}")
+
+API_BUCKETS = {name: TokenBucket(rate, burst) for name, (rate, burst) in API_RATE_LIMITS.items()}
+API_STATS = ApiCallStats()
+
+# --- Helper Function: Execute a Google API Request with Rate Limiting and Retries ---
+def _api_bucket_for(endpoint):
+    if endpoint.startswith('drive.'): return API_BUCKETS['drive']
+    if endpoint in ('sheets.spreadsheets.get', 'sheets.values.get', 'sheets.values.batchGet'): return API_BUCKETS['sheets_read']
+    return API_BUCKETS['sheets_write']
+
+def _is_retryable_api_error(error):
+    """Returns (retryable, throttled) for an exception raised by request.execute()."""
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status == 429: return True, True
+        if status == 403 and any(reason in str(error.content) for reason in API_RATE_LIMIT_REASONS): return True, True
+        return status in API_RETRYABLE_STATUS_CODES, False
+    return isinstance(error, OSError), False # Connection resets, socket timeouts
+
+def execute_google_request(request, endpoint):
+    """Runs request.execute() behind the endpoint's token bucket, retrying 429/5xx with jittered exponential backoff.
+
+    `endpoint` names the API method (e.g. 'sheets.values.append') for quota bucketing, retry budgets
+    and the end-of-run counters. The last error is re-raised once attempts or the budget run out.
+    """
+    bucket = _api_bucket_for(endpoint)
+    for attempt in range(API_MAX_ATTEMPTS):
+        if bucket.acquire() > 0: API_STATS.record(endpoint, 'throttled')
+        API_STATS.record(endpoint, 'calls')
+        try:
+            return request.execute()
+        except Exception as error:
+            retryable, throttled = _is_retryable_api_error(error)
+            if throttled: API_STATS.record(endpoint, 'throttled')
+            if not retryable or attempt == API_MAX_ATTEMPTS - 1 or not API_STATS.take_retry(endpoint):
+                API_STATS.record(endpoint, 'failed'); raise
+            delay = random.uniform(0, min(API_BACKOFF_MAX, API_BACKOFF_BASE * (2 ** attempt)))
+            print(f"{endpoint} failed ({getattr(getattr(error, 'resp', None), 'status', type(error).__name__)}). Retrying in {delay:.1f}s (attempt {attempt + 2} of {API_MAX_ATTEMPTS})...")
+            time.sleep(delay)
+
+# --- Helper Function: Per-Thread Google Service Objects ---
+_worker_state = threading.local()
+
+def get_worker_services(creds):
+    """Returns Drive and Sheets services private to the calling thread.
+
+    googleapiclient service objects share an httplib2 transport that is not thread-safe,
+    so every worker thread builds (once) and reuses its own pair.
+    """
+    services = getattr(_worker_state, 'services', None)
+    if services is None or services[0] is None or services[1] is None:
+        services = build_google_services(creds, quiet=True); _worker_state.services = services
+    return services
+
+# --- Helper Function: Launch a Headless Chrome WebDriver ---
+def create_chrome_driver():
+    """Launches a new headless Chrome WebDriver with the standard capture options."""
+    options = ChromeOptions()
+    options.add_argument("--headless=new"); options.add_argument("--no-sandbox"); options.add_argument("--disable-dev-shm-usage"); options.add_argument(f"--window-size={INITIAL_WINDOW_WIDTH},{INITIAL_WINDOW_HEIGHT}")
+    options.add_argument("--log-level=3"); options.add_argument("--hide-scrollbars"); options.add_argument("--disable-gpu")
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'}) # CDP Network events for network-idle detection
+    service = ChromeService(); driver = webdriver.Chrome(service=service, options=options); driver.set_page_load_timeout(BROWSER_PAGE_LOAD_TIMEOUT)
+    return driver
+
+# --- Helper Function: Discard Buffered Chrome Performance-Log Entries ---
+def drain_performance_log(driver):
+    """Empties the driver's performance log so readiness checks only see the next navigation's events."""
+    try: driver.get_log('performance'); return True
+    except Exception: return False
+
+# --- Helper Function: Wait Until a Page Has Settled ---
+def wait_for_page_ready(driver, max_wait=PAGE_READY_MAX_WAIT, wait_selector=None):
+    """Polls until the page is loaded, network-idle and visually stable, or `max_wait` seconds pass.
+
+    Ready means: document.readyState is 'complete', no more than PAGE_READY_MAX_INFLIGHT_REQUESTS
+    requests have been in flight for PAGE_READY_NETWORK_QUIET seconds (from CDP Network events in the
+    performance log), scrollHeight is unchanged for PAGE_READY_STABLE_POLLS polls, and `wait_selector`
+    (a CSS selector, optional) matches an element. Returns a dict describing what was observed.
+    """
+    start = time.time(); deadline = start + max(0.0, float(max_wait))
+    inflight = set(); last_network_activity = start; network_supported = True
+    last_height = None; stable_polls = 0; selector = wait_selector or None
+    state = {"settle_time": 0.0, "ready_state": False, "network_idle": False, "layout_stable": False, "selector_found": None if not selector else False, "timed_out": False}
+    probe_js = """
+        var sel = arguments[0], found = true;
+        if (sel) { try { found = !!document.querySelector(sel); } catch (e) { found = null; } }
+        var body = document.body, doc = document.documentElement;
+        return [document.readyState, Math.max(body ? body.scrollHeight : 0, doc ? doc.scrollHeight : 0), found];
+    """
+    while True:
+        now = time.time()
+        if network_supported:
+            try: entries = driver.get_log('performance')
+            except Exception: entries = []; network_supported = False
+            for entry in entries:
+                try: message = json.loads(entry.get('message', '{}')).get('message', {})
+                except ValueError: continue
+                method = message.get('method', ''); request_id = message.get('params', {}).get('requestId')
+                if method == 'Network.requestWillBeSent': inflight.add(request_id); last_network_activity = now
+                elif method in ('Network.loadingFinished', 'Network.loadingFailed'): inflight.discard(request_id); last_network_activity = now
+        state["network_idle"] = not network_supported or (len(inflight) <= PAGE_READY_MAX_INFLIGHT_REQUESTS and now - last_network_activity >= PAGE_READY_NETWORK_QUIET)
+        try:
+            ready_state, height, found = driver.execute_script(probe_js, selector)
+            state["ready_state"] = ready_state == 'complete'
+            stable_polls = stable_polls + 1 if height == last_height else 0; last_height = height
+            state["layout_stable"] = stable_polls >= PAGE_READY_STABLE_POLLS
+            if selector:
+                if found is None: print(f"Warning: Invalid wait selector '{selector}'. Ignoring it."); selector = None; state["selector_found"] = None
+                else: state["selector_found"] = found
+        except Exception as e: print(f"Warning: Readiness probe failed: {e}")
+        if state["ready_state"] and state["network_idle"] and state["layout_stable"] and state["selector_found"] is not False: break
+        if time.time() >= deadline: state["timed_out"] = True; break
+        time.sleep(PAGE_READY_POLL_INTERVAL)
+    state["settle_time"] = time.time() - start
+    return state
+
+# --- Helper Function: Describe a Readiness Result for the Log ---
+def describe_page_ready(state):
+    """Formats the dict returned by wait_for_page_ready() as one log line."""
+    flags = f"readyState complete={state['ready_state']}, network idle={state['network_idle']}, layout stable={state['layout_stable']}"
+    if state["selector_found"] is not None: flags += f", selector found={state['selector_found']}"
+    return f"{'Max wait reached' if state['timed_out'] else 'Page ready'} after {state['settle_time']:.2f}s ({flags})"
+
+# --- Helper Function: Scroll Through a Page to Trigger Lazy Loading ---
+def preload_lazy_content(driver, max_height=SCREENSHOT_MAX_HEIGHT):
+    """Scrolls one viewport per animation frame down to `max_height`, then back to the top."""
+    driver.execute_async_script("""
+        var maxY = arguments[0], done = arguments[arguments.length - 1], step = Math.max(window.innerHeight, 200), y = 0;
+        (function next() {
+            var bottom = Math.min(document.documentElement.scrollHeight, maxY);
+            if (y >= bottom) { window.scrollTo(0, 0); requestAnimationFrame(function () { done(true); }); return; }
+            window.scrollTo(0, y); y += step; requestAnimationFrame(next);
+        })();
+    """, max_height)
+
+# --- Helper Functions: Capture Full-Page JPEGs via the Chrome DevTools Protocol ---
+def _page_capture_size(driver, max_height=SCREENSHOT_MAX_HEIGHT):
+    """Returns (width, height) in CSS px of the area a full-page capture covers."""
+    metrics = driver.execute_cdp_cmd('Page.getLayoutMetrics', {})
+    content = metrics.get('cssContentSize') or metrics.get('contentSize') or {}
+    viewport = metrics.get('cssLayoutViewport') or metrics.get('layoutViewport') or {}
+    width = int(viewport.get('clientWidth') or INITIAL_WINDOW_WIDTH)
+    return width, max(1, min(int(content.get('height') or INITIAL_WINDOW_HEIGHT), max_height))
+
+def _capture_jpeg_clip(driver, y, width, clip_height, quality=SCREENSHOT_JPEG_QUALITY):
+    params = {'format': 'jpeg', 'quality': quality, 'captureBeyondViewport': True, 'fromSurface': True, 'clip': {'x': 0, 'y': y, 'width': width, 'height': clip_height, 'scale': 1}}
+    return base64.b64decode(driver.execute_cdp_cmd('Page.captureScreenshot', params)['data'])
+
+def capture_full_page_jpeg(driver, max_height=SCREENSHOT_MAX_HEIGHT, quality=SCREENSHOT_JPEG_QUALITY):
+    """Returns (jpeg_bytes, width, height, image_buffer_bytes) for the whole page without resizing the window.
+
+    Pages up to CDP_SINGLE_SHOT_MAX_HEIGHT are captured in one Page.captureScreenshot call with
+    captureBeyondViewport, so Chrome encodes the JPEG itself. Taller pages are captured as
+    CDP_TILE_HEIGHT clips that are pasted one at a time into an RGB canvas and encoded once.
+    `image_buffer_bytes` is the decoded pixel memory held at the peak (0 when Chrome did the encoding).
+    """
+    width, height = _page_capture_size(driver, max_height)
+    if height <= CDP_SINGLE_SHOT_MAX_HEIGHT: return _capture_jpeg_clip(driver, 0, width, height, quality), width, height, 0
+
+    print(f"Page height {height}px exceeds single-shot limit. Capturing in {CDP_TILE_HEIGHT}px tiles...")
+    canvas = Image.new('RGB', (width, height), (255, 255, 255))
+    for y in range(0, height, CDP_TILE_HEIGHT):
+        with Image.open(io.BytesIO(_capture_jpeg_clip(driver, y, width, min(CDP_TILE_HEIGHT, height - y), quality))) as tile:
+            canvas.paste(tile.convert('RGB'), (0, y))
+    buffer = io.BytesIO(); canvas.save(buffer, 'JPEG', quality=quality); canvas.close()
+    return buffer.getvalue(), width, height, width * height * 3 + width * CDP_TILE_HEIGHT * 3
+
+def capture_page_segments(driver, segment_height=SCREENSHOT_SEGMENT_HEIGHT, max_height=SCREENSHOT_MAX_HEIGHT, quality=SCREENSHOT_JPEG_QUALITY):
+    """Returns ([jpeg_bytes, ...], width, height): the page as consecutive `segment_height` slices, each encoded
+    by Chrome, so no decoded pixels are held in Python at all."""
+    width, height = _page_capture_size(driver, max_height); segment_height = max(1, min(int(segment_height), CDP_SINGLE_SHOT_MAX_HEIGHT))
+    return [_capture_jpeg_clip(driver, y, width, min(segment_height, height - y), quality) for y in range(0, height, segment_height)], width, height
+
+# --- Helper Function: Flatten a PNG Screenshot to JPEG in Strips ---
+def convert_png_screenshot(png_bytes, output_mode=SCREENSHOT_OUTPUT_MODE, strip_height=SCREENSHOT_SEGMENT_HEIGHT, quality=SCREENSHOT_JPEG_QUALITY):
+    """Returns (jpeg_bytes or None, [segment_jpeg_bytes, ...], width, height, image_buffer_bytes) for a legacy PNG capture.
+
+    The PNG is flattened onto white one `strip_height` strip at a time, so no full-size alpha band or
+    RGB copy is made while it is decoded. Segments are encoded straight from the strips. For a single
+    image the strips are kept as fast lossless PNGs until the decoded screenshot has been released, and
+    only then pasted into the RGB canvas that is encoded, so the two full-size buffers never coexist.
+    """
+    strip_height = max(1, int(strip_height)); segments = []; strips = []
+    with Image.open(io.BytesIO(png_bytes)) as img:
+        img.load(); width, height = img.size; has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        strip_bytes = width * min(strip_height, height) * 4; buffer_bytes = width * height * len(img.getbands()) + strip_bytes
+        for y in range(0, height, strip_height):
+            strip = img.crop((0, y, width, min(height, y + strip_height)))
+            if has_alpha:
+                background = Image.new('RGBA', strip.size, (255, 255, 255, 255)); background.alpha_composite(strip.convert('RGBA')); strip = background
+            strip = strip.convert('RGB')
+            if output_mode != 'single': segment_buffer = io.BytesIO(); strip.save(segment_buffer, 'JPEG', quality=quality); segments.append(segment_buffer.getvalue())
+            if output_mode != 'segments': strip_buffer = io.BytesIO(); strip.save(strip_buffer, 'PNG', compress_level=1); strips.append((y, strip_buffer.getvalue()))
+            strip.close()
+        img.close() # Leaving the with-block only closes the file; this frees the decoded pixels
+    if output_mode == 'segments': return None, segments, width, height, buffer_bytes
+    canvas = Image.new('RGB', (width, height), (255, 255, 255)); buffer_bytes = max(buffer_bytes, width * height * 3 + strip_bytes)
+    for y, data in strips:
+        with Image.open(io.BytesIO(data)) as strip: canvas.paste(strip, (0, y))
+    strips = None; jpg_buffer = io.BytesIO(); canvas.save(jpg_buffer, 'JPEG', quality=quality); canvas.close()
+    return jpg_buffer.getvalue(), segments, width, height, buffer_bytes
+
+# --- Helper Functions: Optional Screenshot Derivatives ---
+def make_thumbnail(jpeg_parts, width=SCREENSHOT_THUMBNAIL_WIDTH, quality=SCREENSHOT_JPEG_QUALITY):
+    """Returns a `width`-px-wide JPEG of the stacked `jpeg_parts` (one full image or its segments).
+
+    Each part is decoded with JPEG draft mode, which scales down by up to 8x inside the decoder,
+    so the full-resolution pixels are never held in memory."""
+    scaled = []
+    for part in jpeg_parts:
+        with Image.open(io.BytesIO(part)) as img:
+            part_height = max(1, round(img.height * width / img.width)); img.draft('RGB', (width, part_height))
+            scaled.append(img.convert('RGB').resize((width, part_height), Image.LANCZOS))
+    thumbnail = Image.new('RGB', (width, sum(part.height for part in scaled)), (255, 255, 255)); y = 0
+    for part in scaled: thumbnail.paste(part, (0, y)); y += part.height; part.close()
+    buffer = io.BytesIO(); thumbnail.save(buffer, 'JPEG', quality=quality); thumbnail.close()
+    return buffer.getvalue()
+
+def encode_webp(jpeg_bytes, quality=SCREENSHOT_WEBP_QUALITY):
+    """Re-encodes a JPEG as WebP, or returns None if it exceeds WebP's size limit."""
+    with Image.open(io.BytesIO(jpeg_bytes)) as img:
+        if max(img.size) > WEBP_MAX_DIMENSION: return None
+        buffer = io.BytesIO(); img.convert('RGB').save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+# --- Helper Functions: Process Memory ---
+def read_process_memory():
+    """Returns (rss_bytes, peak_rss_bytes) for this process from /proc/self/status, falling back to getrusage (rss None)."""
+    try:
+        with open('/proc/self/status', 'r', encoding='ascii') as f: fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['VmRSS'].split()[0]) * 1024, int(fields['VmHWM'].split()[0]) * 1024
+    except (OSError, KeyError, ValueError): pass
+    if resource is None: return None, None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None, peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+class RssPeakSampler:
+    """Measures this process's peak RSS over one capture without touching the process-wide high-water mark,
+    so concurrent workers cannot reset each other's measurements.
+
+    A background thread polls VmRSS every `interval` seconds. If VmHWM rose while the sampler ran, that
+    new high-water mark was reached inside the window and is used as well, which covers spikes between polls.
+    With several workers the figure includes their concurrent captures, so it errs on the high side."""
+
+    def __init__(self, interval=CAPTURE_RSS_SAMPLE_INTERVAL):
+        self.interval = interval; self.peak = None; self._hwm_start = None; self._stop = threading.Event(); self._thread = None; self._stopped = False
+
+    def start(self):
+        rss, self._hwm_start = read_process_memory(); self.peak = rss
+        if rss is not None: self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True); self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = read_process_memory()[0]
+            if rss is not None: self.peak = max(self.peak or 0, rss)
+
+    def stop(self):
+        """Stops sampling (idempotent) and returns the peak RSS in bytes, or None if it could not be measured."""
+        if self._stopped: return self.peak
+        self._stopped = True
+        if self._thread: self._stop.set(); self._thread.join()
+        rss, hwm = read_process_memory()
+        samples = [value for value in (self.peak, rss) if value is not None]
+        if hwm is not None and self._hwm_start is not None and hwm > self._hwm_start: samples.append(hwm)
+        self.peak = max(samples) if samples else None
+        return self.peak
+
+# --- Helper Class: Pool of Reusable Chrome WebDrivers ---
+class BrowserPool:
+    """Keeps a bounded set of long-lived headless Chrome drivers and hands out a clean tab per job.
+
+    Drivers are launched lazily and health-checked on every acquire. Each job runs in a tab of its
+    own browser context (Target.createBrowserContext), so cookies, cache, localStorage, IndexedDB and
+    service workers from every origin the job touched are discarded with that context on release. If
+    a context cannot be created, the job falls back to the driver's default context, which is then
+    cleared (cookies, cache and storage of the origins in the tab). Drivers are replaced once they have
+    served `max_pages_per_driver` pages or when a job reports them as broken.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_pages_per_driver=BROWSER_MAX_PAGES_PER_DRIVER):
+        self.size = max(1, int(size)); self.max_pages_per_driver = max_pages_per_driver
+        self._slots = threading.BoundedSemaphore(self.size); self._lock = threading.Lock()
+        self._idle = []; self._page_counts = {}; self._contexts = {}; self.drivers_launched = 0; self.drivers_recycled = 0
+
+    def acquire(self):
+        """Returns a healthy driver with a clean tab, launching a new one if no idle driver is usable."""
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock: driver = self._idle.pop() if self._idle else None
+                if driver is None: break
+                if self._is_healthy(driver): return self._open_job_tab(driver)
+                print("Pooled WebDriver failed health check. Recycling it."); self._discard(driver)
+            print("Launching new pooled WebDriver...")
+            driver = create_chrome_driver()
+            with self._lock: self._page_counts[id(driver)] = 0; self.drivers_launched += 1
+            return self._open_job_tab(driver)
+        except Exception:
+            self._slots.release(); raise
+
+    def release(self, driver, discard=False):
+        """Returns a driver to the pool after a job, recycling it if broken, worn out or not resettable."""
+        try:
+            with self._lock: self._page_counts[id(driver)] = self._page_counts.get(id(driver), 0) + 1; pages_served = self._page_counts[id(driver)]
+            if discard: print("WebDriver marked as broken by the job. Recycling it."); self._discard(driver)
+            elif pages_served >= self.max_pages_per_driver: print(f"WebDriver served {pages_served} pages. Recycling it to limit memory growth."); self._discard(driver)
+            elif not self._reset_context(driver): print("Could not reset WebDriver context. Recycling it."); self._discard(driver)
+            else:
+                with self._lock: self._idle.append(driver)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Quits every idle driver. Call once at the end of the run."""
+        with self._lock: drivers = self._idle; self._idle = []
+        for driver in drivers: self._quit(driver)
+        if self.drivers_launched: print(f"Browser pool closed ({self.drivers_launched} driver(s) launched, {self.drivers_recycled} recycled).")
+
+    def _is_healthy(self, driver):
+        try: driver.execute_script("return 1"); return bool(driver.window_handles)
+        except Exception: return False
+
+    def _open_job_tab(self, driver):
+        """Switches `driver` to a new tab in a fresh browser context and returns the driver."""
+        context_id = None
+        try:
+            home_handle = driver.current_window_handle
+            context_id = driver.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+            target_id = driver.execute_cdp_cmd('Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id})['targetId']
+            driver.switch_to.window(target_id); driver.set_window_size(INITIAL_WINDOW_WIDTH, INITIAL_WINDOW_HEIGHT)
+            with self._lock: self._contexts[id(driver)] = (context_id, home_handle)
+        except Exception as e:
+            print(f"Warning: Could not open an isolated browser context ({e}). Using the default context.")
+            if context_id: self._dispose_context(driver, context_id, home_handle)
+        return driver
+
+    def _dispose_context(self, driver, context_id, home_handle):
+        """Switches back to the default-context tab and disposes `context_id` with all its tabs and data. Returns True on success."""
+        try:
+            driver.switch_to.window(home_handle)
+            driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+            return driver.window_handles == [home_handle]
+        except Exception as e:
+            print(f"Warning: Error while disposing browser context: {e}"); return False
+
+    def _reset_context(self, driver):
+        """Disposes the job's browser context, or clears the default context if the job ran there."""
+        with self._lock: context = self._contexts.pop(id(driver), None)
+        if context: return self._dispose_context(driver, *context)
+        return self._clear_default_context(driver)
+
+    def _clear_default_context(self, driver):
+        """Opens a fresh tab, closes the old ones and clears cookies, cache and storage for visited origins."""
+        try:
+            origins = set()
+            try:
+                frame_tree = driver.execute_cdp_cmd('Page.getFrameTree', {}); pending = [frame_tree.get('frameTree', {})]
+                while pending:
+                    node = pending.pop(); parts = urlsplit(node.get('frame', {}).get('url', ''))
+                    if parts.scheme in ('http', 'https') and parts.netloc: origins.add(f"{parts.scheme}://{parts.netloc}")
+                    pending.extend(node.get('childFrames', []))
+            except Exception: pass
+            for origin in origins: driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {}); driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+            old_handles = driver.window_handles
+            driver.switch_to.new_window('tab'); fresh_handle = driver.current_window_handle
+            for handle in old_handles:
+                if handle != fresh_handle: driver.switch_to.window(handle); driver.close()
+            driver.switch_to.window(fresh_handle); driver.set_window_size(INITIAL_WINDOW_WIDTH, INITIAL_WINDOW_HEIGHT)
+            return True
+        except Exception as e:
+            print(f"Warning: Error while resetting WebDriver context: {e}"); return False
+
+    def _discard(self, driver):
+        with self._lock: self._page_counts.pop(id(driver), None); self._contexts.pop(id(driver), None); self.drivers_recycled += 1
+        self._quit(driver)
+
+    def _quit(self, driver):
+        try: driver.quit()
+        except Exception as qe: print(f"Warning: Error while closing WebDriver: {qe}")
+
 # --- Helper Function: Upload File to Google Drive (Returns File ID and Link) ---
 def upload_to_drive(service, local_filepath, filename_on_drive, folder_id, mime_type):
     """Uploads a file to Google Drive and returns the file ID and webViewLink."""
@@ -104,7 +686,7 @@ def upload_to_drive(service, local_filepath, filename_on_drive, folder_id, mime_
         file_metadata = {'name': filename_on_drive, 'parents': [folder_id]}
         media = MediaFileUpload(local_filepath, mimetype=mime_type, resumable=True)
         print(f"Uploading '{filename_on_drive}' to Drive Folder ID: {folder_id}...")
-        file = service.files().create(body=file_metadata, media_body=media, fields='id, webViewLink').execute()
+        file = execute_google_request(service.files().create(body=file_metadata, media_body=media, fields='id, webViewLink'), 'drive.files.create')
         file_id = file.get('id'); file_link = file.get('webViewLink')
         print(f"Successfully uploaded '{filename_on_drive}' (ID: {file_id})")
         return file_id, file_link
@@ -115,45 +697,142 @@ def upload_to_drive(service, local_filepath, filename_on_drive, folder_id, mime_
         return None, None
     except Exception as e: print(f"An unexpected error occurred during upload of '{filename_on_drive}': {e}"); return None, None
 
+# --- Helper Function: Upload In-Memory Bytes to Google Drive (Returns File ID and Link) ---
+def upload_bytes_to_drive(service, data, filename_on_drive, folder_id, mime_type):
+    """Uploads bytes to Google Drive without touching disk and returns the file ID and webViewLink.
+
+    Payloads up to DRIVE_RESUMABLE_UPLOAD_THRESHOLD are sent as a single multipart request;
+    larger ones use a resumable session.
+    """
+    if not service: print("Drive service not available. Skipping upload."); return None, None
+    if not data: print(f"No data to upload for '{filename_on_drive}'. Skipping upload."); return None, None
+    try:
+        file_metadata = {'name': filename_on_drive, 'parents': [folder_id]}
+        media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mime_type, resumable=len(data) > DRIVE_RESUMABLE_UPLOAD_THRESHOLD)
+        print(f"Uploading '{filename_on_drive}' ({len(data)} bytes) to Drive Folder ID: {folder_id}...")
+        file = execute_google_request(service.files().create(body=file_metadata, media_body=media, fields='id, webViewLink'), 'drive.files.create')
+        file_id = file.get('id'); file_link = file.get('webViewLink')
+        print(f"Successfully uploaded '{filename_on_drive}' (ID: {file_id})")
+        return file_id, file_link
+    except HttpError as error:
+        print(f"An error occurred during upload of '{filename_on_drive}': {error}")
+        if error.resp.status == 404: print(f"Error Detail: Google Drive Folder ID '{folder_id}' not found or permission denied.")
+        elif error.resp.status == 403: print(f"Error Detail: Permission denied for uploading to folder '{folder_id}'.")
+        return None, None
+    except Exception as e: print(f"An unexpected error occurred during upload of '{filename_on_drive}': {e}"); return None, None
+
+# --- Helper Function: Upload a Capture, Spilling Very Large Ones to Disk ---
+def upload_capture(service, data, filename_on_drive, folder_id, mime_type):
+    """Streams a capture to Drive from memory, or via a temp file in LOCAL_SAVE_DIR when spilling is enabled and it is large."""
+    if not (SPILL_LARGE_CAPTURES_TO_DISK and LOCAL_SAVE_DIR and data and len(data) > SPILL_TO_DISK_THRESHOLD):
+        return upload_bytes_to_drive(service, data, filename_on_drive, folder_id, mime_type)
+    local_save_full_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), LOCAL_SAVE_DIR)
+    local_path = os.path.join(local_save_full_dir, f'w{threading.get_ident()}_{filename_on_drive}') # Unique per worker thread
+    try:
+        os.makedirs(local_save_full_dir, exist_ok=True)
+        with open(local_path, 'wb') as f: f.write(data)
+        print(f"Capture is {len(data)} bytes. Spilled to disk for resumable upload: {local_path}")
+    except OSError as e:
+        print(f"Warning: Could not spill '{filename_on_drive}' to disk ({e}). Uploading from memory.")
+        return upload_bytes_to_drive(service, data, filename_on_drive, folder_id, mime_type)
+    try: return upload_to_drive(service, local_path, filename_on_drive, folder_id, mime_type)
+    finally:
+        try: os.remove(local_path)
+        except OSError as e: print(f"Warning: Error removing local file {local_path}: {e}")
+
 # --- Helper Function: Get Jobs from Config Sheet ---
 def get_jobs_from_sheet(service, spreadsheet_id, config_sheet_name='CONFIG'):
-    """Reads job configurations from the specified sheet."""
+    """Reads job configurations from the specified sheet (columns A-C required, D-F optional overrides)."""
     jobs = []
     if not service: print("Sheets service not available. Cannot fetch jobs."); return jobs
     try:
-        range_to_read = f"{config_sheet_name}!A2:C"
         print(f"Reading job configurations from Sheet ID '{spreadsheet_id}', Tab '{config_sheet_name}'...")
-        result = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=range_to_read).execute()
-        values = result.get('values', [])
+        values = read_config_rows(service, spreadsheet_id, config_sheet_name)
         if not values: print(f"No job configurations found in '{config_sheet_name}'.")
-        else:
-            print(f"Found {len(values)} potential jobs.")
-            for i, row in enumerate(values):
-                if len(row) >= 3:
-                    url = row[0].strip(); folder_id = row[1].strip(); sheet_name = row[2].strip()
-                    if url and folder_id and sheet_name: jobs.append({"url": url, "folder_id": folder_id, "sheet_name": sheet_name})
-                    else: print(f"Warning: Skipping row {i+2} in '{config_sheet_name}' due to missing data.")
-                else: print(f"Warning: Skipping row {i+2} in '{config_sheet_name}' because it has fewer than 3 columns.")
-            print(f"Successfully parsed {len(jobs)} valid jobs.")
-    except HttpError as error:
-        print(f"An error occurred reading the config sheet '{config_sheet_name}': {error}"); error_details = error.content.decode() if error.content else ""
-        if error.resp.status == 400 and 'Unable to parse range' in error_details: print(f"**ACTION:** Ensure the tab named '{config_sheet_name}' exists in Spreadsheet ID '{spreadsheet_id}'.")
-        elif error.resp.status == 403: print(f"**ACTION:** Ensure the authenticated user has VIEW permission for Spreadsheet ID '{spreadsheet_id}'.")
+        else: print(f"Found {len(values)} potential jobs."); jobs = parse_job_rows(values, config_sheet_name); print(f"Successfully parsed {len(jobs)} valid jobs.")
+    except HttpError as error: report_config_read_error(error, spreadsheet_id, config_sheet_name)
     except Exception as e: print(f"An unexpected error occurred while fetching jobs: {e}")
     return jobs
 
+# --- Helper Function: Read the Raw CONFIG Rows ---
+def read_config_rows(service, spreadsheet_id, config_sheet_name='CONFIG'):
+    """Returns the CONFIG tab's job rows (A2:F) as lists of strings. Raises HttpError."""
+    result = execute_google_request(service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=f"{config_sheet_name}!A2:F"), 'sheets.values.get')
+    return result.get('values', [])
+
+def report_config_read_error(error, spreadsheet_id, config_sheet_name):
+    print(f"An error occurred reading the config sheet '{config_sheet_name}': {error}"); error_details = error.content.decode() if error.content else ""
+    if error.resp.status == 400 and 'Unable to parse range' in error_details: print(f"**ACTION:** Ensure the tab named '{config_sheet_name}' exists in Spreadsheet ID '{spreadsheet_id}'.")
+    elif error.resp.status == 403: print(f"**ACTION:** Ensure the authenticated user has VIEW permission for Spreadsheet ID '{spreadsheet_id}'.")
+
+# --- Helper Function: Parse CONFIG Rows into Job Dictionaries ---
+def parse_job_rows(values, config_sheet_name='CONFIG'):
+    """Turns raw CONFIG rows into job dicts, warning about (and skipping) incomplete rows and ignoring invalid overrides."""
+    jobs = []
+    for i, row in enumerate(values):
+        if len(row) >= 3:
+            url = row[0].strip(); folder_id = row[1].strip(); sheet_name = row[2].strip()
+            if url and folder_id and sheet_name:
+                job = {"url": url, "folder_id": folder_id, "sheet_name": sheet_name}
+                wait_selector = row[3].strip() if len(row) > 3 else ''; max_wait = row[4].strip() if len(row) > 4 else ''; interval = row[5].strip() if len(row) > 5 else ''
+                if wait_selector: job["wait_selector"] = wait_selector
+                if max_wait:
+                    try: job["max_wait"] = max(0.0, float(max_wait))
+                    except ValueError: print(f"Warning: Ignoring invalid max_wait '{max_wait}' in row {i+2} of '{config_sheet_name}'.")
+                if interval:
+                    seconds = parse_interval(interval)
+                    if seconds is None: print(f"Warning: Ignoring invalid interval '{interval}' in row {i+2} of '{config_sheet_name}'.")
+                    else: job["interval"] = seconds
+                jobs.append(job)
+            else: print(f"Warning: Skipping row {i+2} in '{config_sheet_name}' due to missing data.")
+        else: print(f"Warning: Skipping row {i+2} in '{config_sheet_name}' because it has fewer than 3 columns.")
+    return jobs
+
+# --- Helper Function: Parse a CONFIG Interval ---
+_INTERVAL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_interval(text):
+    """Parses '90', '30m', '6h' or '1d' (a bare number means minutes) into seconds, or returns None."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*', str(text).lower())
+    if not match: return None
+    seconds = float(match.group(1)) * _INTERVAL_UNITS[match.group(2) or 'm']
+    return max(float(MIN_JOB_INTERVAL), seconds) if seconds > 0 else None
+
+# --- Helper Class: Incremental CONFIG Sync for Daemon Mode ---
+class ConfigSync:
+    """Re-reads the CONFIG tab and re-parses it only when its content hash has changed.
+
+    Content is compared rather than the file's Drive modifiedTime because the target tabs live in the same
+    spreadsheet, so every logged row bumps modifiedTime, and the drive.file scope cannot read it anyway."""
+
+    def __init__(self, spreadsheet_id, config_sheet_name='CONFIG'):
+        self.spreadsheet_id = spreadsheet_id; self.config_sheet_name = config_sheet_name; self.content_hash = None
+
+    def poll(self, service):
+        """Returns the parsed job list if CONFIG changed since the last successful poll, else None."""
+        try: values = read_config_rows(service, self.spreadsheet_id, self.config_sheet_name)
+        except HttpError as error: report_config_read_error(error, self.spreadsheet_id, self.config_sheet_name); return None
+        except Exception as e: print(f"An unexpected error occurred while re-reading '{self.config_sheet_name}': {e}"); return None
+        content_hash = hashlib.sha256(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+        if content_hash == self.content_hash: return None
+        jobs = parse_job_rows(values, self.config_sheet_name)
+        if self.content_hash is None: print(f"Loaded {len(jobs)} valid job(s) from '{self.config_sheet_name}'.")
+        else: print(f"'{self.config_sheet_name}' changed; re-parsed {len(jobs)} valid job(s).")
+        self.content_hash = content_hash
+        return jobs
+
 # --- Helper Function: Ensure Sheet Exists (Creates if not) ---
 def ensure_sheet_exists(service, spreadsheet_id, sheet_name):
     """Checks if a sheet exists, creates it if not. Returns True if exists/created, False on error."""
     if not service: return False
     try:
-        sheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields='sheets(properties(title))').execute()
+        sheet_metadata = execute_google_request(service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields='sheets(properties(title))'), 'sheets.spreadsheets.get')
         sheets = sheet_metadata.get('sheets', '')
         for sheet in sheets:
             if sheet.get('properties', {}).get('title') == sheet_name: return True
         print(f"Target sheet '{sheet_name}' not found. Creating it...")
         body = {'requests': [{'addSheet': {'properties': {'title': sheet_name}}}]}
-        response = service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body=body).execute()
+        response = execute_google_request(service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body=body), 'sheets.spreadsheets.batchUpdate')
         print(f"Successfully created sheet '{sheet_name}'."); return True
     except HttpError as error: print(f"An error occurred checking/creating sheet '{sheet_name}': {error}"); return False
     except Exception as e: print(f"An unexpected error occurred during sheet check/creation: {e}"); return False
@@ -164,18 +843,18 @@ def ensure_headers_exist(service, spreadsheet_id, sheet_name, headers):
     if not service: return False
     try:
         range_to_read = f"{sheet_name}!A1:{chr(ord('A') + len(headers) - 1)}1"
-        result = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=range_to_read).execute()
+        result = execute_google_request(service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=range_to_read), 'sheets.values.get')
         values = result.get('values', [])
         if not values or values[0] != headers:
             print(f"Headers missing or incorrect in '{sheet_name}'. Writing headers..."); body = {'values': [headers]}
-            update_result = service.spreadsheets().values().update(spreadsheetId=spreadsheet_id, range=f"{sheet_name}!A1", valueInputOption='USER_ENTERED', body=body).execute()
+            update_result = execute_google_request(service.spreadsheets().values().update(spreadsheetId=spreadsheet_id, range=f"{sheet_name}!A1", valueInputOption='USER_ENTERED', body=body), 'sheets.values.update')
             print(f"Headers written successfully to '{sheet_name}'.")
         return True
     except HttpError as error:
         if error.resp.status == 400 and ('Unable to parse range' in str(error) or 'exceeds grid limits' in str(error)): # Handle empty sheet range error or range not found
             print(f"Sheet '{sheet_name}' appears empty or range invalid. Writing headers...")
             try:
-                body = {'values': [headers]}; update_result = service.spreadsheets().values().update(spreadsheetId=spreadsheet_id, range=f"{sheet_name}!A1", valueInputOption='USER_ENTERED', body=body).execute()
+                body = {'values': [headers]}; update_result = execute_google_request(service.spreadsheets().values().update(spreadsheetId=spreadsheet_id, range=f"{sheet_name}!A1", valueInputOption='USER_ENTERED', body=body), 'sheets.values.update')
                 print(f"Headers written successfully to '{sheet_name}'."); return True
             except HttpError as inner_error: print(f"An error occurred writing headers to new sheet '{sheet_name}': {inner_error}"); return False
         else: print(f"An error occurred checking/writing headers for sheet '{sheet_name}': {error}"); return False
@@ -187,16 +866,624 @@ def append_to_sheet(service, spreadsheet_id, sheet_name, values):
     if not service: print("Sheets service not available. Skipping append."); return False
     try:
         range_to_append = f"{sheet_name}"; body = {'values': [values]}
-        result = service.spreadsheets().values().append(spreadsheetId=spreadsheet_id, range=range_to_append, valueInputOption='USER_ENTERED', insertDataOption='INSERT_ROWS', body=body).execute()
+        result = execute_google_request(service.spreadsheets().values().append(spreadsheetId=spreadsheet_id, range=range_to_append, valueInputOption='USER_ENTERED', insertDataOption='INSERT_ROWS', body=body), 'sheets.values.append')
         return True
     except HttpError as error: print(f"An error occurred appending to Sheet ID '{spreadsheet_id}', Sheet '{sheet_name}': {error}"); return False
     except Exception as e: print(f"An unexpected error occurred during sheet append: {e}"); return False
 
+# --- Helper Function: Hash HTML After Stripping Dynamic Noise ---
+_compiled_normalization_rules = None
+
+def hash_normalized_html(html_bytes):
+    """Applies HTML_NORMALIZATION_RULES and returns the SHA-256 hex digest of the result."""
+    global _compiled_normalization_rules
+    if _compiled_normalization_rules is None: _compiled_normalization_rules = [(re.compile(pattern, re.IGNORECASE | re.DOTALL), replacement) for pattern, replacement in HTML_NORMALIZATION_RULES]
+    text = html_bytes.decode('utf-8', errors='replace')
+    for pattern, replacement in _compiled_normalization_rules: text = pattern.sub(replacement, text)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+# --- Helper Function: Perceptual (Difference) Hash of a Screenshot ---
+def perceptual_hash(image_bytes, hash_size=IMAGE_HASH_SIZE):
+    """Returns a hex difference hash (dHash) of an encoded image; similar images give hashes a few bits apart.
+
+    The grid is `hash_size` columns wide and `hash_size` rows per page-width of height, so pages of
+    different heights give hashes of different lengths (which hash_distance() treats as changed).
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        rows = hash_size * max(1, round(img.height / max(1, img.width)))
+        img.draft('L', (max(hash_size + 1, img.width // 8), max(rows, img.height // 8))) # Lets the JPEG decoder downscale while decoding
+        pixels = list(img.convert('L').resize((hash_size + 1, rows), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(rows):
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[row * (hash_size + 1) + col] > pixels[row * (hash_size + 1) + col + 1])
+    return f"{bits:0{rows * hash_size // 4}x}"
+
+def hash_distance(hash_a, hash_b):
+    """Number of differing bits between two hex hashes (None if either is missing or they differ in size)."""
+    if not hash_a or not hash_b or len(hash_a) != len(hash_b): return None
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+# --- Helper Class: Persistent Index of Last Uploaded Captures ---
+class CaptureIndex:
+    """SQLite-backed record, per CONFIG URL, of the hashes and Drive links of the last uploaded capture."""
+
+    def __init__(self, db_path=CHANGE_INDEX_DB):
+        self.db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), db_path)
+        self._lock = threading.Lock(); self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS captures (url TEXT PRIMARY KEY, html_hash TEXT, image_hash TEXT, image_link TEXT, html_link TEXT, captured_at TEXT)")
+
+    def get(self, url):
+        """Returns the stored record for `url` as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT html_hash, image_hash, image_link, html_link, captured_at FROM captures WHERE url = ?", (url,)).fetchone()
+        return dict(zip(('html_hash', 'image_hash', 'image_link', 'html_link', 'captured_at'), row)) if row else None
+
+    def update(self, url, html_hash, image_hash, image_link, html_link, captured_at):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO captures (url, html_hash, image_hash, image_link, html_link, captured_at) VALUES (?, ?, ?, ?, ?, ?)", (url, html_hash, image_hash, image_link, html_link, captured_at))
+
+    def close(self):
+        with self._lock: self._conn.close()
+
+# --- Helper Functions: Compressed HTML Archive Bundles ---
+def _html_tokens(text):
+    """Splits HTML after every '>' and newline, so deltas work on minified pages too. ''.join() restores the text."""
+    return re.split(r'(?<=[>\n])', text)
+
+def compute_html_delta(parent_text, text, block_tokens=HTML_DELTA_BLOCK_TOKENS):
+    """Returns delta ops turning `parent_text` into `text`: ['c', start, end] copies parent tokens, ['i', str] inserts text.
+
+    Runs in linear time, rsync-style: every run of `block_tokens` consecutive parent tokens is indexed by
+    value, and the new page is walked once, extending the current copy while tokens keep matching and
+    otherwise jumping to an indexed block (so a lone '</div>' never starts a copy) or emitting an insert.
+    """
+    parent_tokens = _html_tokens(parent_text); tokens = _html_tokens(text); ops = []; block_tokens = max(1, int(block_tokens))
+    blocks = {}
+    for i in range(len(parent_tokens) - block_tokens + 1): blocks.setdefault(tuple(parent_tokens[i:i + block_tokens]), i)
+    j = 0; parent_pos = None
+    while j < len(tokens):
+        if parent_pos is None or parent_pos >= len(parent_tokens) or parent_tokens[parent_pos] != tokens[j]:
+            parent_pos = blocks.get(tuple(tokens[j:j + block_tokens]))
+        if parent_pos is None:
+            if ops and ops[-1][0] == 'i': ops[-1][1] += tokens[j]
+            else: ops.append(['i', tokens[j]])
+            j += 1; continue
+        start = parent_pos
+        while j < len(tokens) and parent_pos < len(parent_tokens) and parent_tokens[parent_pos] == tokens[j]: parent_pos += 1; j += 1
+        if ops and ops[-1][0] == 'c' and ops[-1][2] == start: ops[-1][2] = parent_pos
+        else: ops.append(['c', start, parent_pos])
+    return ops
+
+def apply_html_delta(parent_text, ops):
+    """Inverse of compute_html_delta()."""
+    parent_tokens = _html_tokens(parent_text); out = []
+    for op in ops:
+        if op[0] == 'c': out.extend(parent_tokens[op[1]:op[2]])
+        elif op[0] == 'i': out.append(op[1])
+        else: raise ValueError(f"Unknown HTML delta op: {op[0]!r}")
+    return ''.join(out)
+
+def encode_html_bundle(header, payload):
+    """Serializes a bundle (header dict + snapshot text or delta ops) as zstd- or gzip-compressed JSON."""
+    raw = json.dumps(dict(header, payload=payload), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if zstandard: return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return gzip.compress(raw, compresslevel=GZIP_LEVEL)
+
+def decode_html_bundle(data):
+    """Parses bytes produced by encode_html_bundle(). Returns the bundle dict."""
+    if data[:4] == b'\x28\xb5\x2f\xfd':
+        if not zstandard: raise RuntimeError("This bundle is zstd-compressed. Install 'zstandard' to read it.")
+        raw = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    elif data[:2] == b'\x1f\x8b': raw = gzip.decompress(data)
+    else: raise ValueError("Not an HTML archive bundle (unknown compression).")
+    bundle = json.loads(raw.decode('utf-8'))
+    if bundle.get('format') != HTML_ARCHIVE_FORMAT: raise ValueError("Not an HTML archive bundle (unexpected format).")
+    return bundle
+
+def rebuild_html(fetch_bundle, file_id):
+    """Rebuilds the page source stored in bundle `file_id`.
+
+    `fetch_bundle(file_id)` must return a bundle's raw bytes. The bundle lists its predecessor chain
+    (snapshot first), which is fetched and replayed in order; the result is checked against the stored SHA-256.
+    """
+    target = decode_html_bundle(fetch_bundle(file_id)); text = None
+    for bundle in [decode_html_bundle(fetch_bundle(chain_id)) for chain_id in target.get('chain', [])] + [target]:
+        if bundle['kind'] == 'snapshot': text = bundle['payload']
+        elif text is None: raise ValueError("Delta bundle has no snapshot at the start of its chain.")
+        else: text = apply_html_delta(text, bundle['payload'])
+    if hashlib.sha256(text.encode('utf-8')).hexdigest() != target.get('sha256'): raise ValueError(f"Rebuilt HTML for {file_id} does not match its checksum.")
+    return text
+
+def download_drive_file(service, file_id):
+    """Downloads a Drive file's content into memory."""
+    buffer = io.BytesIO(); downloader = MediaIoBaseDownload(buffer, service.files().get_media(fileId=file_id)); done = False
+    while not done: _, done = downloader.next_chunk()
+    return buffer.getvalue()
+
+def rebuild_html_from_drive(service, file_id):
+    """Reader API: returns the HTML text of any capture archived in 'delta' mode, given its bundle's Drive file ID."""
+    return rebuild_html(lambda chain_id: download_drive_file(service, chain_id), file_id)
+
+# --- Helper Class: Snapshot/Delta State per URL for HTML Archiving ---
+class HtmlArchive:
+    """Builds snapshot or delta bundles for each capture and remembers each URL's chain in SQLite.
+
+    A URL's chain is the Drive file IDs from its latest snapshot to its latest delta, plus the last
+    archived HTML (compressed) to diff the next capture against.
+    """
+
+    def __init__(self, db_path=CHANGE_INDEX_DB, snapshot_every=HTML_ARCHIVE_SNAPSHOT_EVERY):
+        self.db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), db_path); self.snapshot_every = max(1, int(snapshot_every))
+        self._lock = threading.Lock(); self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS html_archive (url TEXT PRIMARY KEY, chain TEXT, last_html BLOB)")
+
+    def build_bundle(self, url, html_text, captured_at):
+        """Returns (bundle_bytes, pending_state) for this capture. Pass pending_state to commit() after uploading."""
+        with self._lock: row = self._conn.execute("SELECT chain, last_html FROM html_archive WHERE url = ?", (url,)).fetchone()
+        header = {'format': HTML_ARCHIVE_FORMAT, 'version': 1, 'url': url, 'captured_at': captured_at, 'sha256': hashlib.sha256(html_text.encode('utf-8')).hexdigest()}
+        snapshot = encode_html_bundle(dict(header, kind='snapshot', chain=[]), html_text)
+        if row and row[0] and len(json.loads(row[0])) < self.snapshot_every:
+            chain = json.loads(row[0])
+            try:
+                delta = encode_html_bundle(dict(header, kind='delta', chain=chain), compute_html_delta(gzip.decompress(row[1]).decode('utf-8'), html_text))
+                if len(delta) <= len(snapshot) * HTML_ARCHIVE_MAX_DELTA_RATIO:
+                    print(f"HTML archived as delta #{len(chain)} ({len(delta)} bytes vs {len(snapshot)} for a snapshot).")
+                    return delta, {'url': url, 'chain': chain, 'html': html_text}
+                print(f"HTML delta too large ({len(delta)} bytes). Storing a new snapshot.")
+            except Exception as e: print(f"Warning: Could not build HTML delta ({e}). Storing a new snapshot.")
+        print(f"HTML archived as snapshot ({len(snapshot)} bytes, {len(html_text.encode('utf-8'))} uncompressed).")
+        return snapshot, {'url': url, 'chain': [], 'html': html_text}
+
+    def commit(self, pending_state, file_id):
+        """Records an uploaded bundle as the newest link in its URL's chain."""
+        chain = pending_state['chain'] + [file_id]
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO html_archive (url, chain, last_html) VALUES (?, ?, ?)", (pending_state['url'], json.dumps(chain), gzip.compress(pending_state['html'].encode('utf-8'), compresslevel=6)))
+
+    def close(self):
+        with self._lock: self._conn.close()
+
+# --- Helper Class: Per-Job Phase Timings and Byte Counts ---
+class JobMetrics:
+    """Accumulates wall-clock seconds per named phase, numeric values (bytes, pixels) and peaks (memory) for one job."""
+
+    def __init__(self, url, sheet_name):
+        self.url = url; self.sheet_name = sheet_name; self.phases = {}; self.values = {}; self.peaks = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try: yield
+        finally: self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, value):
+        self.values[name] = self.values.get(name, 0) + value
+
+    def peak(self, name, value):
+        if value is not None: self.peaks[name] = max(self.peaks.get(name, 0), value)
+
+    def as_dict(self):
+        return {'phases': {name: round(seconds, 4) for name, seconds in self.phases.items()}, 'values': dict(self.values), 'peaks': dict(self.peaks)}
+
+# --- Helper Function: Nearest-Rank Percentile ---
+def percentile(values, pct):
+    """Returns the nearest-rank `pct` percentile (0-100) of `values`, or None if empty."""
+    if not values: return None
+    ordered = sorted(values); rank = max(1, min(len(ordered), int(-(-pct * len(ordered) // 100))))
+    return ordered[rank - 1]
+
+# --- Helper Class: Run-Wide Metrics Collector and Exporters ---
+class RunMetrics:
+    """Collects job results for the run: appends them to METRICS_FILE as JSON lines, renders a p50/p95
+    phase table, and exposes Prometheus text via a file and/or a small HTTP endpoint."""
+
+    def __init__(self, metrics_file=METRICS_FILE, prometheus_textfile=PROMETHEUS_TEXTFILE, max_jobs=None):
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.metrics_file = os.path.join(script_dir, metrics_file) if metrics_file else None
+        self.prometheus_textfile = os.path.join(script_dir, prometheus_textfile) if prometheus_textfile else None
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S"); self._lock = threading.Lock(); self._server = None
+        self._jobs = deque(maxlen=max_jobs) # Percentiles come from these; with max_jobs (daemon mode) only the most recent jobs are kept
+        self._jobs_recorded = 0; self._status_counts = {}; self._phase_totals = {}; self._value_totals = {}; self._peak_values = {} # Cumulative, for counters, sums and maxima
+
+    def record_job(self, result):
+        """Stores a process_url() result and appends it to the metrics file."""
+        record = {'type': 'job', 'run_id': self.run_id, 'url': result.get('url'), 'sheet_name': result.get('sheet_name'), 'status': result.get('status'), 'duration': round(result.get('duration', 0.0), 4)}
+        record.update(result.get('metrics') or {'phases': {}, 'values': {}, 'peaks': {}})
+        with self._lock:
+            self._jobs.append(record); self._jobs_recorded += 1; self._status_counts[record['status']] = self._status_counts.get(record['status'], 0) + 1
+            for name, seconds in record['phases'].items(): totals = self._phase_totals.setdefault(name, [0, 0.0]); totals[0] += 1; totals[1] += seconds
+            if record['status'] != 'skipped': totals = self._phase_totals.setdefault('job_total', [0, 0.0]); totals[0] += 1; totals[1] += record['duration']
+            for key, value in record['values'].items(): self._value_totals[key] = self._value_totals.get(key, 0) + value
+            for key, value in record.get('peaks', {}).items(): self._peak_values[key] = max(self._peak_values.get(key, 0), value)
+            self._append(record)
+
+    def record_run(self, duration, extra_phases=None):
+        record = {'type': 'run', 'run_id': self.run_id, 'duration': round(duration, 4), 'jobs': self._jobs_recorded, 'phases': {name: round(seconds, 4) for name, seconds in (extra_phases or {}).items()}, 'api': API_STATS.totals()}
+        with self._lock: self._append(record)
+
+    def _append(self, record):
+        if not self.metrics_file: return
+        try:
+            with open(self.metrics_file, 'a', encoding='utf-8') as f: f.write(json.dumps(record) + '\n')
+        except OSError as e: print(f"Warning: Could not write metrics to {self.metrics_file}: {e}")
+
+    def phase_stats(self):
+        """Returns {phase: (count, p50, p95, total)} across all recorded jobs, plus a 'job_total' row (percentiles over the kept window)."""
+        with self._lock: jobs = list(self._jobs); phase_totals = {name: tuple(totals) for name, totals in self._phase_totals.items()}
+        samples = {}
+        for job in jobs:
+            for name, seconds in job['phases'].items(): samples.setdefault(name, []).append(seconds)
+            if job['status'] != 'skipped': samples.setdefault('job_total', []).append(job['duration'])
+        return {name: (count, percentile(samples[name], 50), percentile(samples[name], 95), total) for name, (count, total) in phase_totals.items() if name in samples}
+
+    def print_phase_table(self):
+        stats = self.phase_stats()
+        if not stats: return
+        print(f"{'Phase':<18}{'Jobs':>6}{'p50 (s)':>10}{'p95 (s)':>10}{'Total (s)':>11}")
+        for name, (count, p50, p95, total) in sorted(stats.items(), key=lambda item: -item[1][3]):
+            print(f"{name:<18}{count:>6}{p50:>10.2f}{p95:>10.2f}{total:>11.1f}")
+        totals = self.value_totals()
+        if totals: print("Totals: " + ", ".join(f"{key} {value}" for key, value in sorted(totals.items())))
+        peaks = self.peak_values()
+        if peaks: print("Peaks: " + ", ".join(f"{key} {value / 1048576:.1f} MiB" for key, value in sorted(peaks.items())))
+
+    def value_totals(self):
+        """Returns each recorded value (bytes, pixels) summed over all jobs."""
+        with self._lock: return dict(self._value_totals)
+
+    def peak_values(self):
+        """Returns the largest value of each per-job peak (memory, in bytes) seen so far."""
+        with self._lock: return dict(self._peak_values)
+
+    def render_prometheus(self):
+        """Returns the run's metrics in the Prometheus text exposition format."""
+        with self._lock: statuses = dict(self._status_counts)
+        lines = ['# HELP trackerscraper_jobs_total Jobs processed in the current run, by status.', '# TYPE trackerscraper_jobs_total counter']
+        lines += [f'trackerscraper_jobs_total{{status="{status}"}} {count}' for status, count in sorted(statuses.items())]
+        lines += ['# HELP trackerscraper_phase_seconds Per-job time spent in each phase.', '# TYPE trackerscraper_phase_seconds summary']
+        for name, (count, p50, p95, total) in sorted(self.phase_stats().items()):
+            lines += [f'trackerscraper_phase_seconds{{phase="{name}",quantile="0.5"}} {p50:.4f}', f'trackerscraper_phase_seconds{{phase="{name}",quantile="0.95"}} {p95:.4f}',
+                      f'trackerscraper_phase_seconds_sum{{phase="{name}"}} {total:.4f}', f'trackerscraper_phase_seconds_count{{phase="{name}"}} {count}']
+        totals = self.value_totals()
+        lines += ['# HELP trackerscraper_values_total Byte and pixel counts summed over the run.', '# TYPE trackerscraper_values_total counter']
+        lines += [f'trackerscraper_values_total{{name="{key}"}} {value}' for key, value in sorted(totals.items())]
+        lines += ['# HELP trackerscraper_peak_bytes Largest per-capture memory peak seen so far.', '# TYPE trackerscraper_peak_bytes gauge']
+        lines += [f'trackerscraper_peak_bytes{{name="{key}"}} {value}' for key, value in sorted(self.peak_values().items())]
+        lines += ['# HELP trackerscraper_api_calls_total Google API calls by outcome.', '# TYPE trackerscraper_api_calls_total counter']
+        lines += [f'trackerscraper_api_calls_total{{outcome="{key}"}} {value}' for key, value in sorted(API_STATS.totals().items())]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus_textfile(self):
+        if not self.prometheus_textfile: return
+        try:
+            temp_path = self.prometheus_textfile + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f: f.write(self.render_prometheus())
+            os.replace(temp_path, self.prometheus_textfile); print(f"Prometheus metrics written to {self.prometheus_textfile}")
+        except OSError as e: print(f"Warning: Could not write Prometheus metrics to {self.prometheus_textfile}: {e}")
+
+    def serve(self, port):
+        """Starts a background HTTP server exposing render_prometheus() at /metrics on localhost."""
+        run_metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics': self.send_error(404); return
+                body = run_metrics.render_prometheus().encode('utf-8')
+                self.send_response(200); self.send_header('Content-Type', 'text/plain; version=0.0.4'); self.send_header('Content-Length', str(len(body))); self.end_headers(); self.wfile.write(body)
+            def log_message(self, *args): pass
+
+        try:
+            self._server = ThreadingHTTPServer(('127.0.0.1', int(port)), MetricsHandler)
+            threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+            print(f"Serving Prometheus metrics on http://127.0.0.1:{self._server.server_address[1]}/metrics")
+        except OSError as e: print(f"Warning: Could not start metrics endpoint on port {port}: {e}"); self._server = None
+
+    def close(self):
+        if self._server: self._server.shutdown(); self._server.server_close(); self._server = None
+
+# --- Helper Function: Quote a Sheet Name for A1 Notation ---
+def a1_range(sheet_name, cells=None):
+    """Returns an A1 range such as 'My Tab'!A1:C1, quoting the tab name so spaces and apostrophes are safe."""
+    quoted = "'" + str(sheet_name).replace("'", "''") + "'"
+    return f"{quoted}!{cells}" if cells else quoted
+
+# --- Helper Class: Cached Registry of Target Tabs and Headers ---
+class SheetRegistry:
+    """In-memory view of which tabs exist in the target spreadsheet and which have the expected headers.
+
+    One spreadsheets.get per run builds the tab list; prepare() then creates every missing tab
+    in a single batchUpdate and writes every missing header row in a single values.batchUpdate.
+    Tab titles are matched case-insensitively, as Sheets does. If a batch is rejected (for example
+    because one name is invalid), its tabs are retried one at a time so only the bad tab stays unready.
+    """
+
+    def __init__(self, spreadsheet_id, headers):
+        self.spreadsheet_id = spreadsheet_id; self.headers = list(headers)
+        self._titles = None; self._ready = set(); self._lock = threading.Lock() # _titles maps casefolded title -> actual title
+
+    def load(self, service):
+        """Fetches the spreadsheet's tab titles once. Returns True on success."""
+        if not service: return False
+        try:
+            metadata = execute_google_request(service.spreadsheets().get(spreadsheetId=self.spreadsheet_id, fields='sheets(properties(title))'), 'sheets.spreadsheets.get')
+            titles = [sheet.get('properties', {}).get('title') for sheet in metadata.get('sheets', [])]
+            with self._lock: self._titles = {title.casefold(): title for title in titles if title}
+            print(f"Loaded {len(titles)} tab name(s) from Sheet ID '{self.spreadsheet_id}'.")
+            return True
+        except HttpError as error: print(f"An error occurred loading spreadsheet metadata: {error}"); return False
+        except Exception as e: print(f"An unexpected error occurred loading spreadsheet metadata: {e}"); return False
+
+    def is_ready(self, sheet_name):
+        with self._lock: return sheet_name in self._ready
+
+    def title_for(self, sheet_name):
+        """Returns the existing tab's actual title for `sheet_name` (which may differ in case), or `sheet_name` itself."""
+        with self._lock: return (self._titles or {}).get(str(sheet_name).casefold(), sheet_name)
+
+    def _run_batch(self, names, make_request, endpoint, action):
+        """Executes make_request(names) as one call; if it fails, once per name. Returns the names that succeeded."""
+        try: execute_google_request(make_request(names), endpoint); return list(names)
+        except Exception as e:
+            if len(names) == 1: print(f"An error occurred {action} '{names[0]}': {e}"); return []
+            print(f"Batch {action} {len(names)} sheet(s) failed ({e}). Retrying one at a time...")
+        return [name for name in names if self._run_batch([name], make_request, endpoint, action)]
+
+    def prepare(self, service, sheet_names):
+        """Ensures every tab in `sheet_names` exists and has headers, normally in at most three API calls. Returns the ready names."""
+        if self._titles is None and not self.load(service):
+            with self._lock: return set(self._ready)
+        with self._lock:
+            wanted = [name for name in dict.fromkeys(sheet_names) if name and name not in self._ready]
+            if not wanted: return set(self._ready)
+            missing = list({name.casefold(): name for name in reversed(wanted) if name.casefold() not in self._titles}.values())[::-1] # One per case-insensitive title
+            existing = [name for name in wanted if name.casefold() in self._titles]
+            created = []
+            if missing:
+                print(f"Creating {len(missing)} missing target sheet(s): {missing}")
+                add_sheets = lambda names: service.spreadsheets().batchUpdate(spreadsheetId=self.spreadsheet_id, body={'requests': [{'addSheet': {'properties': {'title': name}}} for name in names]})
+                created = self._run_batch(missing, add_sheets, 'sheets.spreadsheets.batchUpdate', 'creating')
+                self._titles.update({name.casefold(): name for name in created})
+            created_keys = {name.casefold() for name in created}
+            needs_headers = [name for name in wanted if name.casefold() in created_keys]
+            if existing:
+                header_cells = f"A1:{chr(ord('A') + len(self.headers) - 1)}1"
+                try:
+                    response = execute_google_request(service.spreadsheets().values().batchGet(spreadsheetId=self.spreadsheet_id, ranges=[a1_range(self._titles[name.casefold()], header_cells) for name in existing]), 'sheets.values.batchGet')
+                    for name, value_range in zip(existing, response.get('valueRanges', [])):
+                        values = value_range.get('values', [])
+                        if values and values[0] == self.headers: self._ready.add(name)
+                        else: needs_headers.append(name)
+                except HttpError as error: print(f"An error occurred reading headers of {existing}: {error}")
+                except Exception as e: print(f"An unexpected error occurred reading headers of {existing}: {e}")
+            if needs_headers:
+                print(f"Writing headers to {len(needs_headers)} sheet(s): {needs_headers}")
+                write_headers = lambda names: service.spreadsheets().values().batchUpdate(spreadsheetId=self.spreadsheet_id, body={'valueInputOption': 'USER_ENTERED', 'data': [{'range': a1_range(self._titles[name.casefold()], 'A1'), 'values': [self.headers]} for name in names]})
+                self._ready.update(self._run_batch(needs_headers, write_headers, 'sheets.values.batchUpdate', 'writing headers to'))
+            not_ready = [name for name in wanted if name not in self._ready]
+            if not_ready: print(f"WARNING: {len(not_ready)} target sheet(s) are not ready and will keep their rows pending: {not_ready}")
+            return set(self._ready)
+
+# --- Helper Class: Buffered, Journaled Sheet Row Writer ---
+class SheetRowBuffer:
+    """Buffers log rows per tab and writes each tab's rows with one values.append call.
+
+    Every row is journaled to `journal_path` (fsynced) before it is buffered and removed from the
+    journal only after it has been written, so rows pending at a crash are replayed on the next run.
+    Delivery is at-least-once: a crash between an append and the journal rewrite can repeat rows.
+    """
+
+    def __init__(self, spreadsheet_id, registry, journal_path=SHEETS_JOURNAL_FILE, flush_every=SHEETS_FLUSH_EVERY_ROWS):
+        self.spreadsheet_id = spreadsheet_id; self.registry = registry; self.flush_every = max(1, int(flush_every))
+        self.journal_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), journal_path) if journal_path else None
+        self._pending = []; self._added_since_flush = 0; self._lock = threading.Lock(); self._flush_lock = threading.Lock()
+        self.rows_written = 0
+
+    def load_journal(self):
+        """Re-queues rows left in the journal by an earlier run. Returns how many were recovered."""
+        if not self.journal_path or not os.path.exists(self.journal_path): return 0
+        recovered = []
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try: entry = json.loads(line)
+                    except ValueError: continue # A torn final line from a crash mid-write
+                    if isinstance(entry, dict) and entry.get('sheet_name') and isinstance(entry.get('values'), list): recovered.append(entry)
+        except OSError as e: print(f"Warning: Could not read Sheets journal {self.journal_path}: {e}"); return 0
+        with self._lock: self._pending = recovered + self._pending
+        if recovered: print(f"Recovered {len(recovered)} pending sheet row(s) from {self.journal_path}.")
+        return len(recovered)
+
+    def pending_count(self):
+        with self._lock: return len(self._pending)
+
+    def pending_sheet_names(self):
+        with self._lock: return {entry['sheet_name'] for entry in self._pending}
+
+    def add_row(self, service, sheet_name, values):
+        """Journals and buffers one row, flushing when SHEETS_FLUSH_EVERY_ROWS rows are pending.
+
+        Returns True once the row is journaled and queued; whether it reached Sheets is only known after
+        flush(). pending_sheet_names() lists the tabs that still have rows waiting."""
+        entry = {'sheet_name': sheet_name, 'values': list(values)}
+        with self._lock:
+            if self.journal_path:
+                try:
+                    with open(self.journal_path, 'a', encoding='utf-8') as f: f.write(json.dumps(entry) + '\n'); f.flush(); os.fsync(f.fileno())
+                except OSError as e: print(f"Warning: Could not journal sheet row for '{sheet_name}': {e}")
+            self._pending.append(entry); self._added_since_flush += 1; should_flush = self._added_since_flush >= self.flush_every
+        if should_flush: self.flush(service)
+        return True
+
+    def flush(self, service):
+        """Writes all pending rows, one values.append per tab. Rows that fail stay pending. Returns rows written."""
+        if not service: print("Sheets service not available. Keeping rows pending."); return 0
+        with self._flush_lock:
+            with self._lock: batch = list(self._pending); self._added_since_flush = 0
+            if not batch: return 0
+            by_sheet = {}
+            for entry in batch: by_sheet.setdefault(entry['sheet_name'], []).append(entry)
+            self.registry.prepare(service, list(by_sheet))
+            done = []
+            for sheet_name, entries in by_sheet.items():
+                if not self.registry.is_ready(sheet_name): print(f"Sheet '{sheet_name}' is not ready. Keeping {len(entries)} row(s) pending."); continue
+                try:
+                    body = {'values': [entry['values'] for entry in entries]}
+                    execute_google_request(service.spreadsheets().values().append(spreadsheetId=self.spreadsheet_id, range=a1_range(self.registry.title_for(sheet_name)), valueInputOption='USER_ENTERED', insertDataOption='INSERT_ROWS', body=body), 'sheets.values.append')
+                    print(f"Appended {len(entries)} row(s) to Google Sheet '{sheet_name}'."); done.extend(entries)
+                except HttpError as error: print(f"An error occurred appending {len(entries)} row(s) to Sheet '{sheet_name}': {error}")
+                except Exception as e: print(f"An unexpected error occurred appending to Sheet '{sheet_name}': {e}")
+            done_ids = {id(entry) for entry in done}
+            with self._lock:
+                self._pending = [entry for entry in self._pending if id(entry) not in done_ids]
+                self.rows_written += len(done); self._rewrite_journal()
+            return len(done)
+
+    def _rewrite_journal(self):
+        """Atomically replaces the journal with the rows still pending. Caller holds self._lock."""
+        if not self.journal_path: return
+        try:
+            if not self._pending:
+                if os.path.exists(self.journal_path): os.remove(self.journal_path)
+                return
+            temp_path = self.journal_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for entry in self._pending: f.write(json.dumps(entry) + '\n')
+                f.flush(); os.fsync(f.fileno())
+            os.replace(temp_path, self.journal_path)
+        except OSError as e: print(f"Warning: Could not rewrite Sheets journal {self.journal_path}: {e}")
+
+# --- Helper Class: Daemon-Mode Job Schedule ---
+class JobScheduler:
+    """Priority queue of CONFIG jobs, each due every `interval` seconds (CONFIG column F, default DEFAULT_JOB_INTERVAL).
+
+    Jobs are keyed by (url, folder_id, sheet_name). A job is never queued while it is running. First runs are spread
+    over min(interval, SCHEDULER_STARTUP_SPREAD) by a stable per-job offset, and later runs keep that offset, so
+    jobs sharing an interval do not all fire at once. Start times are saved to SCHEDULER_STATE_FILE across restarts."""
+
+    def __init__(self, state_file=SCHEDULER_STATE_FILE, startup_spread=SCHEDULER_STARTUP_SPREAD):
+        self.state_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), state_file) if state_file else None
+        self.startup_spread = max(0.0, float(startup_spread)); self._entries = {}; self._heap = []; self._sequence = 0; self._running = set()
+        self._last_started = self._load_state()
+
+    @staticmethod
+    def job_key(job):
+        return (job.get("url"), job.get("folder_id"), job.get("sheet_name"))
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path): return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f: return {tuple(item['key']): float(item['last_started']) for item in json.load(f)}
+        except (OSError, ValueError, KeyError, TypeError) as e: print(f"Warning: Ignoring unreadable scheduler state {self.state_path}: {e}"); return {}
+
+    def _save_state(self):
+        if not self.state_path: return
+        try:
+            temp_path = self.state_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f: json.dump([{'key': list(key), 'last_started': started} for key, started in self._last_started.items()], f)
+            os.replace(temp_path, self.state_path)
+        except OSError as e: print(f"Warning: Could not save scheduler state to {self.state_path}: {e}")
+
+    def _first_due(self, key, interval, now):
+        last_started = self._last_started.get(key)
+        if last_started is not None: return max(now, last_started + interval)
+        fraction = int(hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:8], 16) / float(0xFFFFFFFF)
+        return now + fraction * min(interval, self.startup_spread)
+
+    def _push(self, key):
+        entry = self._entries[key]; self._sequence += 1
+        heapq.heappush(self._heap, (entry['due'], self._sequence, key))
+
+    def sync(self, jobs, now=None):
+        """Applies a freshly parsed CONFIG job list. Returns (added, removed, updated) counts."""
+        now = time.time() if now is None else now; seen = set(); added = updated = 0
+        for job in jobs:
+            key = self.job_key(job); interval = float(job.get("interval") or DEFAULT_JOB_INTERVAL); seen.add(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = {'job': job, 'interval': interval, 'due': self._first_due(key, interval, now)}; added += 1
+                if key not in self._running: self._push(key) # A job re-added mid-run is queued when that run completes
+            elif entry['job'] != job:
+                entry['job'] = job; updated += 1
+                if entry['interval'] != interval:
+                    entry['interval'] = interval
+                    if key not in self._running: entry['due'] = self._first_due(key, interval, now); self._push(key)
+        removed = [key for key in self._entries if key not in seen]
+        for key in removed: del self._entries[key]
+        if removed: self._last_started = {key: started for key, started in self._last_started.items() if key in self._entries}; self._save_state()
+        return added, len(removed), updated
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard_stale(self):
+        while self._heap:
+            due, _, key = self._heap[0]; entry = self._entries.get(key)
+            if entry is not None and key not in self._running and entry['due'] == due: return
+            heapq.heappop(self._heap)
+
+    def seconds_until_next(self, now=None):
+        """Seconds until the earliest queued job is due (0 if overdue), or None if nothing is queued."""
+        self._discard_stale()
+        if not self._heap: return None
+        return max(0.0, self._heap[0][0] - (time.time() if now is None else now))
+
+    def pop_due(self, now=None):
+        """Marks the earliest due job as running and returns it, or returns None if no job is due yet."""
+        now = time.time() if now is None else now; self._discard_stale()
+        if not self._heap or self._heap[0][0] > now: return None
+        _, _, key = heapq.heappop(self._heap); entry = self._entries[key]
+        self._running.add(key); self._last_started[key] = now; self._save_state()
+        return entry['job']
+
+    def complete(self, job, now=None):
+        """Re-queues a finished job one interval after its previous due time (or now, if it has fallen behind)."""
+        key = self.job_key(job); self._running.discard(key); entry = self._entries.get(key)
+        if entry is None: return # Removed from CONFIG while it was running
+        entry['due'] = max(entry['due'] + entry['interval'], time.time() if now is None else now); self._push(key)
+
+# --- Helper Function: Upload Optional Thumbnail and WebP Copies of a Screenshot ---
+def upload_screenshot_derivatives(drive_service, jpeg_bytes, segments, jpg_filename, folder_id, metrics):
+    """Uploads the configured thumbnail and WebP copies next to the screenshot. Failures are reported, not raised."""
+    if SCREENSHOT_THUMBNAIL_WIDTH:
+        try:
+            thumbnail_bytes = make_thumbnail([jpeg_bytes] if jpeg_bytes else segments, int(SCREENSHOT_THUMBNAIL_WIDTH))
+            thumbnail_id, _ = upload_capture(drive_service, thumbnail_bytes, jpg_filename.replace('.jpg', '_thumb.jpg'), folder_id, 'image/jpeg')
+            if thumbnail_id: metrics.count('upload_bytes', len(thumbnail_bytes))
+        except Exception as e: print(f"Error creating thumbnail: {e}")
+    if SCREENSHOT_WEBP:
+        if not pil_features.check('webp'): print("Skipping WebP: this Pillow build has no WebP support."); return
+        sources = [(jpg_filename.replace('.jpg', '.webp'), jpeg_bytes)] if jpeg_bytes else [(jpg_filename.replace('.jpg', f'_part{i+1:02d}.webp'), segment) for i, segment in enumerate(segments)]
+        for webp_filename, source in sources:
+            try:
+                webp_bytes = encode_webp(source)
+                if webp_bytes is None: print(f"Skipping WebP for '{webp_filename}': taller than {WEBP_MAX_DIMENSION}px (use segments)."); continue
+                webp_id, _ = upload_capture(drive_service, webp_bytes, webp_filename, folder_id, 'image/webp')
+                if webp_id: metrics.count('upload_bytes', len(webp_bytes))
+            except Exception as e: print(f"Error creating WebP '{webp_filename}': {e}")
+
 # --- Function to Process a Single URL Job (Syntax Corrected) ---
-def process_url(job_config, drive_service, sheets_service, target_spreadsheet_id):
-    """Handles capturing, uploading, and logging for one URL configuration."""
+def process_url(job_config, drive_service, sheets_service, target_spreadsheet_id, browser_pool=None, sheet_writer=None, change_index=None, html_archive=None):
+    """Handles capturing, uploading, and logging for one URL configuration.
+
+    When `browser_pool` is given, the driver is borrowed from the pool and returned afterwards
+    instead of launching and quitting a dedicated Chrome instance for this job. When
+    `sheet_writer` (a SheetRowBuffer) is given, the log row is buffered instead of appended directly
+    and 'logged' only means it was queued; main() downgrades jobs whose rows are still pending after the final flush.
+    When `change_index` (a CaptureIndex) is given, uploads are skipped if the page is unchanged.
+    When `html_archive` (an HtmlArchive) is given, the page source is uploaded as a snapshot/delta bundle.
+    Returns a result dict (status 'ok', 'partial', 'failed' or 'skipped') for the run summary.
+    """
+    job_start = time.time()
     url = job_config.get("url"); folder_id = job_config.get("folder_id"); sheet_name = job_config.get("sheet_name")
-    if not all([url, folder_id, sheet_name]): print(f"Skipping job due to invalid data: {job_config}"); return
+    metrics = JobMetrics(url, sheet_name)
+    result = {"url": url, "sheet_name": sheet_name, "status": "failed", "screenshot": False, "html": False, "image_link": None, "html_link": None, "logged": False, "duration": 0.0, "settle_time": None, "metrics": metrics.as_dict()}
+    if not all([url, folder_id, sheet_name]): print(f"Skipping job due to invalid data: {job_config}"); result["status"] = "skipped"; return result
 
     print(f"\n--- Processing Job for Sheet: '{sheet_name}' (URL: {url}) ---")
     print(f"Drive Folder ID: {folder_id}"); print(f"Target Sheet: '{sheet_name}' in SheetID '{target_spreadsheet_id}'")
@@ -210,118 +1497,232 @@ def process_url(job_config, drive_service, sheets_service, target_spreadsheet_id
 
     jpg_filename = f'{file_timestamp}_{sanitized_sheet_name}_screenshot.jpg'; html_filename = f'{file_timestamp}_{sanitized_sheet_name}_pagesource.html'
 
-    script_dir = os.path.dirname(os.path.abspath(__file__)); local_save_full_dir = os.path.join(script_dir, LOCAL_SAVE_DIR)
-    if not os.path.exists(local_save_full_dir):
-        try: os.makedirs(local_save_full_dir)
-        except OSError as dir_e: print(f"ERROR: Could not create local directory {local_save_full_dir}: {dir_e}. Skipping job."); return
-
-    local_png_temp_path = os.path.join(local_save_full_dir, f'temp_{file_timestamp}_{sanitized_sheet_name}.png'); local_jpg_path = os.path.join(local_save_full_dir, jpg_filename); local_html_path = os.path.join(local_save_full_dir, html_filename)
-
-    driver = None; screenshot_success = False; html_success = False
+    driver = None; driver_broken = False; screenshot_success = False; html_success = False; jpeg_bytes = None; segments = []; html_bytes = None
+    initial_width = INITIAL_WINDOW_WIDTH; initial_height = INITIAL_WINDOW_HEIGHT
     try: # Main Selenium block
-        print("Setting up WebDriver..."); options = ChromeOptions(); initial_width = 1366; initial_height = 1080
-        options.add_argument("--headless=new"); options.add_argument("--no-sandbox"); options.add_argument("--disable-dev-shm-usage"); options.add_argument(f"--window-size={initial_width},{initial_height}")
-        options.add_argument("--log-level=3"); options.add_argument("--hide-scrollbars"); options.add_argument("--disable-gpu")
-        service = ChromeService(); driver = webdriver.Chrome(service=service, options=options); driver.set_page_load_timeout(60)
+        with metrics.phase('driver_acquire'):
+            if browser_pool: print("Acquiring WebDriver from browser pool..."); driver = browser_pool.acquire()
+            else: print("Setting up WebDriver..."); driver = create_chrome_driver()
 
-        print(f"Accessing URL: {url}"); driver.get(url)
-        wait_time = 10; print(f"Waiting {wait_time}s for initial page load..."); time.sleep(wait_time)
+        max_wait = job_config.get("max_wait", PAGE_READY_MAX_WAIT); wait_selector = job_config.get("wait_selector")
+        drain_performance_log(driver)
+        print(f"Accessing URL: {url}")
+        with metrics.phase('page_load'): driver.get(url)
+        print(f"Waiting up to {max_wait}s for the page to settle" + (f" (selector '{wait_selector}')..." if wait_selector else "..."))
+        ready_state = wait_for_page_ready(driver, max_wait=max_wait, wait_selector=wait_selector); result["settle_time"] = ready_state["settle_time"]; metrics.add('page_settle', ready_state["settle_time"])
+        print(describe_page_ready(ready_state))
 
         print("Attempting screenshot...")
         try: # Screenshot capture block
-            js_commands = ["return document.body.parentNode.scrollHeight", "return document.documentElement.scrollHeight", "return document.body.scrollHeight", "return Math.max( document.body.scrollHeight, document.body.offsetHeight, document.documentElement.clientHeight, document.documentElement.scrollHeight, document.documentElement.offsetHeight );"]
-            total_height = 0
-            for js in js_commands:
-                try: height = driver.execute_script(js); total_height = max(total_height, int(height)) if isinstance(height, (int,float)) else total_height
-                except Exception: pass
-            max_screenshot_height = 30000; resize_height = min(total_height, max_screenshot_height) if total_height > initial_height else initial_height
-            if resize_height > initial_height: print(f"Resizing window height to {resize_height}px..."); driver.set_window_size(initial_width, resize_height); time.sleep(2)
-            else: print(f"Using initial window height ({initial_height}px)."); driver.set_window_size(initial_width, initial_height); time.sleep(0.5)
-
-            driver.save_screenshot(local_png_temp_path); print(f"Temporary PNG saved: {local_png_temp_path}")
-            print(f"Converting PNG to JPG: {local_jpg_path}...")
-            with Image.open(local_png_temp_path) as img:
-                 if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info): bg = Image.new("RGB", img.size, (255, 255, 255)); bg.paste(img, mask=img.split()[-1]); img = bg
-                 img.save(local_jpg_path, 'JPEG', quality=85)
-            print("Conversion to JPG successful."); screenshot_success = True
-            os.remove(local_png_temp_path); print(f"Removed temporary PNG.")
-        except Exception as e:
-            print(f"Error during screenshot capture/conversion: {e}")
-            # --- SYNTAX FIX 1: Corrected temp file cleanup ---
-            if os.path.exists(local_png_temp_path):
+            capture_memory = RssPeakSampler().start(); image_buffer_bytes = 0
+            if SCREENSHOT_CAPTURE_MODE == 'cdp':
                 try:
-                    os.remove(local_png_temp_path)
-                except Exception as remove_err:
-                    print(f"Warning: Could not remove temp file {local_png_temp_path}: {remove_err}")
-                    pass # Ignore cleanup error
-            # --- End SYNTAX FIX 1 ---
+                    if SCREENSHOT_PRELOAD_LAZY_CONTENT:
+                        with metrics.phase('lazy_preload'): preload_lazy_content(driver); lazy_state = wait_for_page_ready(driver, max_wait=LAYOUT_SETTLE_MAX_WAIT)
+                        result["settle_time"] += lazy_state["settle_time"]; print(f"Lazy content preload: {describe_page_ready(lazy_state)}")
+                    with metrics.phase('screenshot'):
+                        if SCREENSHOT_OUTPUT_MODE != 'single': segments, shot_width, shot_height = capture_page_segments(driver)
+                        if SCREENSHOT_OUTPUT_MODE != 'segments': jpeg_bytes, shot_width, shot_height, image_buffer_bytes = capture_full_page_jpeg(driver)
+                except Exception as cdp_e: print(f"CDP capture failed ({cdp_e}). Falling back to window-resize capture."); jpeg_bytes = None; segments = []
+            if jpeg_bytes is not None or segments:
+                print(f"JPG captured via CDP ({shot_width}x{shot_height}px" + (f", {len(jpeg_bytes)} bytes" if jpeg_bytes else "") + (f", {len(segments)} segment(s) of {sum(len(segment) for segment in segments)} bytes" if segments else "") + ")."); screenshot_success = True
+                metrics.count('screenshot_height_px', shot_height)
+            else:
+                js_commands = ["return document.body.parentNode.scrollHeight", "return document.documentElement.scrollHeight", "return document.body.scrollHeight", "return Math.max( document.body.scrollHeight, document.body.offsetHeight, document.documentElement.clientHeight, document.documentElement.scrollHeight, document.documentElement.offsetHeight );"]
+                total_height = 0
+                for js in js_commands:
+                    try: height = driver.execute_script(js); total_height = max(total_height, int(height)) if isinstance(height, (int,float)) else total_height
+                    except Exception: pass
+                max_screenshot_height = SCREENSHOT_MAX_HEIGHT; resize_height = min(total_height, max_screenshot_height) if total_height > initial_height else initial_height
+                if resize_height > initial_height:
+                    print(f"Resizing window height to {resize_height}px...")
+                    with metrics.phase('resize'): driver.set_window_size(initial_width, resize_height); layout_state = wait_for_page_ready(driver, max_wait=LAYOUT_SETTLE_MAX_WAIT)
+                    result["settle_time"] += layout_state["settle_time"]
+                    print(f"Layout after resize: {describe_page_ready(layout_state)}")
+                else: print(f"Using initial window height ({initial_height}px)."); driver.set_window_size(initial_width, initial_height)
+
+                with metrics.phase('screenshot'): png_bytes = driver.get_screenshot_as_png()
+                print(f"PNG captured in memory ({len(png_bytes)} bytes). Converting to JPG in {SCREENSHOT_SEGMENT_HEIGHT}px strips...")
+                with metrics.phase('image_convert'): jpeg_bytes, segments, _, shot_height, image_buffer_bytes = convert_png_screenshot(png_bytes)
+                del png_bytes; metrics.count('screenshot_height_px', shot_height)
+                print(f"Conversion to JPG successful (" + (f"{len(jpeg_bytes)} bytes" if jpeg_bytes else f"{len(segments)} segment(s) of {sum(len(segment) for segment in segments)} bytes") + ")."); screenshot_success = True
+            metrics.peak('image_buffer_bytes', image_buffer_bytes)
+        except Exception as e:
+            print(f"Error during screenshot capture/conversion: {e}"); jpeg_bytes = None; segments = []
+        finally: metrics.peak('capture_rss_peak_bytes', capture_memory.stop())
 
         if screenshot_success: # HTML capture block
             print("Capturing HTML source...")
             try:
-                html_content = driver.page_source
-                with open(local_html_path, 'w', encoding='utf-8') as f: f.write(html_content)
-                print(f"HTML source saved: {local_html_path}"); html_success = True
-            except Exception as e: print(f"Error saving HTML source: {e}")
+                with metrics.phase('html_capture'): html_bytes = driver.page_source.encode('utf-8')
+                print(f"HTML source captured ({len(html_bytes)} bytes)."); html_success = True; metrics.count('html_bytes', len(html_bytes))
+            except Exception as e: print(f"Error capturing HTML source: {e}")
         else: print("Skipping HTML capture due to earlier screenshot failure.")
 
-    except Exception as e: print(f"An error occurred during Selenium operation for {url}: {e}")
-    finally: # Driver quit block
-        # --- SYNTAX FIX 2: Corrected driver quit ---
-        if driver:
+    except Exception as e: print(f"An error occurred during Selenium operation for {url}: {e}"); driver_broken = True
+    finally: # Driver release/quit block
+        release_start = time.perf_counter()
+        if driver and browser_pool:
+            print("Returning WebDriver to browser pool."); browser_pool.release(driver, discard=driver_broken)
+        elif driver:
             print("Closing WebDriver.")
             try:
                 driver.quit()
             except Exception as qe:
                 print(f"Warning: Error while closing WebDriver: {qe}")
-        # --- End SYNTAX FIX 2 ---
+        if driver: metrics.add('driver_release', time.perf_counter() - release_start)
+    if jpeg_bytes: metrics.count('screenshot_bytes', len(jpeg_bytes))
+    elif segments: metrics.count('screenshot_bytes', sum(len(segment) for segment in segments))
 
+    # --- Compare Against the Last Uploaded Capture ---
+    unchanged = False; html_hash = None; image_hash = None; previous = None
+    if change_index and screenshot_success and html_success:
+        try:
+            with metrics.phase('change_check'):
+                html_hash = hash_normalized_html(html_bytes); previous = change_index.get(url)
+                image_hash = perceptual_hash(jpeg_bytes) if jpeg_bytes else ''.join(perceptual_hash(segment) for segment in segments)
+            if previous:
+                distance = hash_distance(previous['image_hash'], image_hash)
+                unchanged = previous['html_hash'] == html_hash and distance is not None and distance <= IMAGE_HASH_CHANGE_THRESHOLD
+                print(f"Change check vs capture of {previous['captured_at']}: HTML {'same' if previous['html_hash'] == html_hash else 'changed'}, screenshot hash distance {distance}. {'Unchanged - skipping upload.' if unchanged else 'Changed.'}")
+            else: print("No previous capture indexed for this URL.")
+        except Exception as e: print(f"Warning: Change detection failed ({e}). Uploading anyway.")
 
     # --- Upload to Google Drive ---
     jpg_file_id = None; jpg_link = None; html_file_id = None; html_link = None
-    if screenshot_success: jpg_file_id, jpg_link = upload_to_drive(drive_service, local_jpg_path, jpg_filename, folder_id, 'image/jpeg')
-    if html_success: html_file_id, html_link = upload_to_drive(drive_service, local_html_path, html_filename, folder_id, 'text/html')
-
-    # --- Ensure Target Sheet Exists and Has Headers ---
-    sheet_ready = False; print(f"Ensuring target sheet '{sheet_name}' exists and has headers...")
-    if ensure_sheet_exists(sheets_service, target_spreadsheet_id, sheet_name):
-        if ensure_headers_exist(sheets_service, target_spreadsheet_id, sheet_name, EXPECTED_HEADERS): sheet_ready = True
-        else: print(f"Failed to ensure headers in sheet '{sheet_name}'. Skipping append.")
-    else: print(f"Failed to ensure sheet '{sheet_name}' exists. Skipping append.")
-
-    # --- Log to Google Sheets ---
-    if sheet_ready:
+    if not unchanged:
+        if screenshot_success:
+            with metrics.phase('upload_image'):
+                if jpeg_bytes:
+                    jpg_file_id, jpg_link = upload_capture(drive_service, jpeg_bytes, jpg_filename, folder_id, 'image/jpeg')
+                    if jpg_file_id: metrics.count('upload_bytes', len(jpeg_bytes))
+                segment_links = []
+                for i, segment in enumerate(segments):
+                    segment_id, segment_link = upload_capture(drive_service, segment, jpg_filename.replace('.jpg', f'_part{i+1:02d}.jpg'), folder_id, 'image/jpeg')
+                    if not segment_id: break
+                    segment_links.append(segment_link); metrics.count('upload_bytes', len(segment))
+                if not jpeg_bytes: jpg_link = segment_links[0] if len(segment_links) == len(segments) else None # The sheet links the first segment; the rest sit beside it in the folder
+            if SCREENSHOT_THUMBNAIL_WIDTH or SCREENSHOT_WEBP:
+                derivative_memory = RssPeakSampler().start()
+                try:
+                    with metrics.phase('image_derivatives'): upload_screenshot_derivatives(drive_service, jpeg_bytes, segments, jpg_filename, folder_id, metrics)
+                finally: metrics.peak('capture_rss_peak_bytes', derivative_memory.stop())
+        if html_success and html_archive:
+            try:
+                with metrics.phase('html_archive'): bundle_bytes, archive_state = html_archive.build_bundle(url, html_bytes.decode('utf-8'), timestamp_str)
+                with metrics.phase('upload_html'): html_file_id, html_link = upload_capture(drive_service, bundle_bytes, html_filename.replace('.html', '.htmlbundle'), folder_id, 'application/octet-stream')
+                if html_file_id: html_archive.commit(archive_state, html_file_id); metrics.count('upload_bytes', len(bundle_bytes))
+            except Exception as e: print(f"Error archiving HTML bundle: {e}")
+        elif html_success:
+            with metrics.phase('upload_html'): html_file_id, html_link = upload_capture(drive_service, html_bytes, html_filename, folder_id, 'text/html')
+            if html_file_id: metrics.count('upload_bytes', len(html_bytes))
+        if change_index and html_hash and image_hash and jpg_link and html_link:
+            try: change_index.update(url, html_hash, image_hash, jpg_link, html_link, timestamp_str)
+            except Exception as e: print(f"Warning: Could not update change index for {url}: {e}")
+    jpeg_bytes = None; segments = None; html_bytes = None # Release capture buffers before the Sheets calls
+
+    if unchanged:
+        unchanged_image = f'=HYPERLINK("{previous["image_link"]}", "{UNCHANGED_MARKER}")' if previous.get('image_link') else UNCHANGED_MARKER
+        unchanged_html = f'=HYPERLINK("{previous["html_link"]}", "{UNCHANGED_MARKER}")' if previous.get('html_link') else UNCHANGED_MARKER
+        sheet_values = [timestamp_str, unchanged_image, unchanged_html] if LOG_UNCHANGED_ROWS else None
+    else:
         image_link_for_sheet = jpg_link if jpg_link else "JPG Upload Failed" if screenshot_success else "Capture Failed"
         html_link_for_sheet = html_link if html_link else "HTML Upload Failed" if html_success else "Capture Skipped/Failed"
         sheet_values = [timestamp_str, image_link_for_sheet, html_link_for_sheet]
-        print(f"Appending to Google Sheet '{sheet_name}': {sheet_values}")
-        append_success = append_to_sheet(sheets_service, target_spreadsheet_id, sheet_name, sheet_values)
-        if append_success: print("Append successful.")
-    else: print("Skipping append operation due to sheet/header setup failure.")
+    append_success = False; sheet_log_start = time.perf_counter()
+    if sheet_values is None: print("Page unchanged and LOG_UNCHANGED_ROWS is off. Not logging a row.")
+    elif sheet_writer: # --- Buffer Row for a Batched Sheets Write ---
+        print(f"Queueing row for Google Sheet '{sheet_name}': {sheet_values}")
+        append_success = sheet_writer.add_row(sheets_service, sheet_name, sheet_values)
+    else:
+        # --- Ensure Target Sheet Exists and Has Headers ---
+        sheet_ready = False; print(f"Ensuring target sheet '{sheet_name}' exists and has headers...")
+        if ensure_sheet_exists(sheets_service, target_spreadsheet_id, sheet_name):
+            if ensure_headers_exist(sheets_service, target_spreadsheet_id, sheet_name, EXPECTED_HEADERS): sheet_ready = True
+            else: print(f"Failed to ensure headers in sheet '{sheet_name}'. Skipping append.")
+        else: print(f"Failed to ensure sheet '{sheet_name}' exists. Skipping append.")
+
+        # --- Log to Google Sheets ---
+        if sheet_ready:
+            print(f"Appending to Google Sheet '{sheet_name}': {sheet_values}")
+            append_success = append_to_sheet(sheets_service, target_spreadsheet_id, sheet_name, sheet_values)
+            if append_success: print("Append successful.")
+        else: print("Skipping append operation due to sheet/header setup failure.")
+    if sheet_values is not None: metrics.add('sheet_log', time.perf_counter() - sheet_log_start)
+
+    result.update({"screenshot": screenshot_success, "html": html_success, "image_link": jpg_link, "html_link": html_link, "logged": append_success, "metrics": metrics.as_dict()})
+    if unchanged: result["status"] = "unchanged"
+    elif screenshot_success and html_success and jpg_link and html_link and append_success: result["status"] = "ok"
+    elif append_success or jpg_link or html_link: result["status"] = "partial"
+    result["duration"] = time.time() - job_start
+    settle_note = f", settle {result['settle_time']:.2f}s" if result["settle_time"] is not None else ""
+    print(f"--- Finished Processing Job for Sheet: '{sheet_name}' ({result['status']}, {result['duration']:.1f}s{settle_note}) ---")
+    return result
+
+# --- Helper Function: Run One Job on a Worker Thread ---
+def run_job_in_worker(job, job_number, job_count, creds, target_spreadsheet_id, browser_pool, sheet_writer=None, change_index=None, html_archive=None):
+    """Processes one job with the calling thread's own Google clients. Never raises."""
+    job_label = f"Job {job_number} of {job_count}" if job_count else f"Job {job_number}"
+    print(f"\n>>> Starting {job_label} [{threading.current_thread().name}] <<<")
+    try:
+        if not isinstance(job, dict):
+            print(f"Skipping item {job_number}: Invalid job format (expected dictionary).")
+            return {"url": None, "sheet_name": None, "status": "skipped", "duration": 0.0}
+        drive_service, sheets_service = get_worker_services(creds)
+        if not drive_service or not sheets_service:
+            print(f"Failed to build Google services for job {job_number}. Skipping it.")
+            return {"url": job.get("url"), "sheet_name": job.get("sheet_name"), "status": "failed", "duration": 0.0}
+        return process_url(job, drive_service, sheets_service, target_spreadsheet_id, browser_pool=browser_pool, sheet_writer=sheet_writer, change_index=change_index, html_archive=html_archive)
+    except Exception as e:
+        print(f"An unexpected error occurred in job {job_number}: {e}")
+        return {"url": job.get("url") if isinstance(job, dict) else None, "sheet_name": job.get("sheet_name") if isinstance(job, dict) else None, "status": "failed", "duration": 0.0}
+    finally:
+        print(f">>> Finished {job_label} <<<")
 
-    # --- Cleanup Local Files ---
-    print("Cleaning up local files for this job..."); files_to_remove = [local_jpg_path, local_html_path, local_png_temp_path]
-    for f_path in files_to_remove:
-        if os.path.exists(f_path):
-            try: os.remove(f_path)
-            except Exception as e: print(f"Warning: Error removing local file {f_path}: {e}")
-    print("Local files cleanup finished.")
+# --- Helper Function: Print Aggregate Run Summary ---
+def print_run_summary(results, wall_duration, max_workers, run_metrics=None):
+    """Prints per-status counts, failed jobs, throughput and (with `run_metrics`) the per-phase p50/p95 table."""
+    counts = {"ok": 0, "unchanged": 0, "partial": 0, "failed": 0, "skipped": 0}
+    for r in results: counts[r.get("status", "failed")] = counts.get(r.get("status", "failed"), 0) + 1
+    job_durations = [r.get("duration", 0.0) for r in results if r.get("status") != "skipped"]
+    print("\n==================== Run Summary ====================")
+    print(f"Workers: {max_workers} | Jobs: {len(results)} | OK: {counts['ok']} | Unchanged: {counts['unchanged']} | Partial: {counts['partial']} | Failed: {counts['failed']} | Skipped: {counts['skipped']}")
+    if job_durations:
+        print(f"Job time: avg {sum(job_durations) / len(job_durations):.1f}s, max {max(job_durations):.1f}s, total {sum(job_durations):.1f}s (wall {wall_duration:.1f}s)")
+        if wall_duration > 0: print(f"Throughput: {len(job_durations) * 60.0 / wall_duration:.1f} jobs/minute")
+    API_STATS.print_summary()
+    if run_metrics: run_metrics.print_phase_table()
+    settle_times = [r["settle_time"] for r in results if r.get("settle_time") is not None]
+    if settle_times: print(f"Page settle time: avg {sum(settle_times) / len(settle_times):.2f}s, min {min(settle_times):.2f}s, max {max(settle_times):.2f}s")
+    for r in results:
+        if r.get("status") in ("failed", "partial"): print(f"  {r.get('status').upper()}: '{r.get('sheet_name')}' ({r.get('url')})")
+    print("=====================================================")
 
-    print(f"--- Finished Processing Job for Sheet: '{sheet_name}' ---")
+# --- Helper Function: Open the Change Index and HTML Archive State ---
+def open_capture_state(change_detection, html_archive_mode):
+    """Returns (change_index, html_archive), either of which is None when disabled or unavailable."""
+    change_index = None
+    if change_detection:
+        try: change_index = CaptureIndex(); print(f"Change detection enabled (index: {change_index.db_path}).")
+        except sqlite3.Error as e: print(f"Warning: Could not open change index {CHANGE_INDEX_DB}: {e}. Uploading every capture.")
+    html_archive = None
+    if html_archive_mode == 'delta':
+        try: html_archive = HtmlArchive(); print(f"HTML archive mode: snapshot every {html_archive.snapshot_every} captures, deltas in between ({'zstd' if zstandard else 'gzip'}).")
+        except sqlite3.Error as e: print(f"Warning: Could not open HTML archive state {CHANGE_INDEX_DB}: {e}. Uploading plain HTML.")
+    return change_index, html_archive
 
 # --- Main Execution Logic ---
-def main():
-    """Main function to run the scraper jobs."""
-    start_time = time.time()
+def main(max_workers=MAX_WORKERS, change_detection=CHANGE_DETECTION_ENABLED, html_archive_mode=HTML_ARCHIVE_MODE, metrics_port=METRICS_PORT):
+    """Main function to run the scraper jobs, `max_workers` at a time."""
+    start_time = time.time(); max_workers = max(1, int(max_workers))
+    run_metrics = RunMetrics()
+    if metrics_port: run_metrics.serve(metrics_port)
     print(f"Starting Web Capture and Upload Process at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}...")
 
-    script_dir = os.path.dirname(os.path.abspath(__file__)); local_save_full_dir = os.path.join(script_dir, LOCAL_SAVE_DIR)
-    if not os.path.exists(local_save_full_dir):
-        try: os.makedirs(local_save_full_dir); print(f"Created local directory: {local_save_full_dir}")
-        except Exception as e: print(f"CRITICAL ERROR: Could not create local directory {local_save_full_dir}: {e}"); return
-
     print("\nAuthenticating with Google...")
-    drive_service, sheets_service = get_authenticated_services()
+    creds = get_credentials()
+    if not creds: print("Failed to authenticate with Google. Exiting."); return
+    drive_service, sheets_service = build_google_services(creds)
     if not drive_service or not sheets_service: print("Failed to authenticate/build Google services. Exiting."); return
 
     print(f"\nFetching job configurations from Google Sheet '{CONFIG_SHEET_NAME}'...")
@@ -330,20 +1731,138 @@ def main():
     print("\nStarting processing of fetched jobs...")
     if not scrape_jobs: print("No valid jobs found in the config sheet. Exiting."); return
 
-    job_count = len(scrape_jobs); print(f"Found {job_count} valid job(s).")
-    for i, job in enumerate(scrape_jobs):
-        print(f"\n>>> Starting Job {i+1} of {job_count} <<<")
-        if isinstance(job, dict): process_url(job, drive_service, sheets_service, CONFIG_SPREADSHEET_ID)
-        else: print(f"Skipping item {i+1}: Invalid job format (expected dictionary).")
-        print(f">>> Finished Job {i+1} of {job_count} <<<")
+    job_count = len(scrape_jobs); max_workers = min(max_workers, job_count); print(f"Found {job_count} valid job(s). Running with {max_workers} worker(s).")
+
+    print("\nPreparing target sheets...")
+    sheet_registry = SheetRegistry(CONFIG_SPREADSHEET_ID, EXPECTED_HEADERS); sheet_registry.load(sheets_service)
+    sheet_registry.prepare(sheets_service, [job.get("sheet_name") for job in scrape_jobs if isinstance(job, dict)])
+    sheet_writer = SheetRowBuffer(CONFIG_SPREADSHEET_ID, sheet_registry); sheet_writer.load_journal()
+
+    change_index, html_archive = open_capture_state(change_detection, html_archive_mode)
+
+    browser_pool = BrowserPool(size=max(BROWSER_POOL_SIZE, max_workers)); results = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='worker') as executor:
+            futures = [executor.submit(run_job_in_worker, job, i+1, job_count, creds, CONFIG_SPREADSHEET_ID, browser_pool, sheet_writer, change_index, html_archive) for i, job in enumerate(scrape_jobs)]
+            for future in as_completed(futures):
+                result = future.result(); results.append(result); run_metrics.record_job(result)
+    finally:
+        browser_pool.close()
+        if change_index: change_index.close()
+        if html_archive: html_archive.close()
+        print("\nFlushing buffered sheet rows...")
+        flush_start = time.perf_counter(); sheet_writer.flush(sheets_service); flush_seconds = time.perf_counter() - flush_start
+        if sheet_writer.pending_count(): print(f"WARNING: {sheet_writer.pending_count()} sheet row(s) could not be written and remain in {sheet_writer.journal_path} for the next run.")
+        else: print(f"All {sheet_writer.rows_written} sheet row(s) written.")
+        unlogged_sheets = sheet_writer.pending_sheet_names()
+        for result in results: # Rows were only queued during the jobs; jobs whose tab still has rows pending did not get logged
+            if result.get("logged") and result.get("sheet_name") in unlogged_sheets:
+                result["logged"] = False
+                if result.get("status") == "ok": result["status"] = "partial"
 
     end_time = time.time(); duration = end_time - start_time
+    print_run_summary(results, duration, max_workers, run_metrics)
+    run_metrics.record_run(duration, {'sheets_flush': flush_seconds}); run_metrics.write_prometheus_textfile(); run_metrics.close()
+    if run_metrics.metrics_file: print(f"Per-job metrics appended to {run_metrics.metrics_file}")
     print("\n--------------------------------------------------")
     print(f"All processed jobs finished in {duration:.2f} seconds.")
     print(f"Script finished at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}.")
     print("--------------------------------------------------")
 
+# --- Daemon Mode: Keep Services Warm and Capture Each URL on Its Own Interval ---
+def run_daemon(max_workers=MAX_WORKERS, change_detection=CHANGE_DETECTION_ENABLED, html_archive_mode=HTML_ARCHIVE_MODE, metrics_port=METRICS_PORT, sync_interval=CONFIG_SYNC_INTERVAL):
+    """Runs until SIGTERM/SIGINT, reusing one set of Google clients, browsers and indexes. Each CONFIG job is captured
+    every `interval`, at most `max_workers` at a time, and CONFIG is re-read every `sync_interval` seconds."""
+    start_time = time.time(); max_workers = max(1, int(max_workers)); sync_interval = max(1.0, float(sync_interval))
+    run_metrics = RunMetrics(max_jobs=METRICS_WINDOW_JOBS)
+    if metrics_port: run_metrics.serve(metrics_port)
+    print(f"Starting Web Capture Daemon at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} with {max_workers} worker(s)...")
+
+    print("\nAuthenticating with Google...")
+    creds = get_credentials()
+    if not creds: print("Failed to authenticate with Google. Exiting."); return
+    drive_service, sheets_service = build_google_services(creds)
+    if not drive_service or not sheets_service: print("Failed to authenticate/build Google services. Exiting."); return
+
+    sheet_registry = SheetRegistry(CONFIG_SPREADSHEET_ID, EXPECTED_HEADERS); sheet_registry.load(sheets_service)
+    sheet_writer = SheetRowBuffer(CONFIG_SPREADSHEET_ID, sheet_registry); sheet_writer.load_journal()
+    change_index, html_archive = open_capture_state(change_detection, html_archive_mode)
+    config_sync = ConfigSync(CONFIG_SPREADSHEET_ID, CONFIG_SHEET_NAME); scheduler = JobScheduler()
+
+    stop_event = threading.Event()
+    def request_stop(signum, frame): print(f"\nReceived signal {signum}; finishing running jobs and shutting down..."); stop_event.set()
+    previous_handlers = {signum: signal.signal(signum, request_stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+
+    browser_pool = BrowserPool(size=max(BROWSER_POOL_SIZE, max_workers)); in_flight = {}; next_sync = 0.0; job_number = 0; status_counts = {}
+    API_STATS.start_window(); next_budget_window = time.time() + API_RETRY_BUDGET_WINDOW
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='worker') as executor:
+            while not stop_event.is_set() or in_flight:
+                now = time.time()
+                if now >= next_budget_window: # Retry budgets are per window here, or a long-lived daemon would eventually stop retrying
+                    ApiCallStats.print_window(API_STATS.start_window(), f"in the last {API_RETRY_BUDGET_WINDOW:.0f}s"); next_budget_window = now + API_RETRY_BUDGET_WINDOW
+                if not stop_event.is_set() and now >= next_sync:
+                    jobs = config_sync.poll(sheets_service); next_sync = now + sync_interval
+                    if jobs is not None:
+                        sheet_registry.prepare(sheets_service, [job["sheet_name"] for job in jobs])
+                        added, removed, updated = scheduler.sync(jobs, now)
+                        print(f"Schedule updated: {added} added, {removed} removed, {updated} changed; {len(scheduler)} job(s) scheduled.")
+                while not stop_event.is_set() and len(in_flight) < max_workers:
+                    job = scheduler.pop_due()
+                    if job is None: break
+                    job_number += 1; in_flight[executor.submit(run_job_in_worker, job, job_number, None, creds, CONFIG_SPREADSHEET_ID, browser_pool, sheet_writer, change_index, html_archive)] = job
+
+                if in_flight:
+                    until_next = scheduler.seconds_until_next() if len(in_flight) < max_workers else None
+                    timeout = min(value for value in (until_next, max(0.0, next_sync - time.time()), 1.0) if value is not None) if not stop_event.is_set() else None
+                    done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = in_flight.pop(future); result = future.result(); scheduler.complete(job); run_metrics.record_job(result)
+                        status_counts[result.get("status", "failed")] = status_counts.get(result.get("status", "failed"), 0) + 1
+                    if done and not in_flight:
+                        if sheet_writer.pending_count(): sheet_writer.flush(sheets_service) # Idle: don't leave rows waiting for SHEETS_FLUSH_EVERY_ROWS
+                        run_metrics.write_prometheus_textfile()
+                        until_next = scheduler.seconds_until_next()
+                        print(f"Idle. {job_number} job(s) run so far ({', '.join(f'{status} {count}' for status, count in sorted(status_counts.items()))}). " + (f"Next job due in {until_next:.0f}s." if until_next is not None else "No jobs scheduled."))
+                else:
+                    until_next = scheduler.seconds_until_next()
+                    stop_event.wait(min(value for value in (until_next, max(0.0, next_sync - time.time())) if value is not None))
+    finally:
+        for signum, handler in previous_handlers.items(): signal.signal(signum, handler)
+        browser_pool.close()
+        if change_index: change_index.close()
+        if html_archive: html_archive.close()
+        print("\nFlushing buffered sheet rows...")
+        flush_start = time.perf_counter(); sheet_writer.flush(sheets_service); flush_seconds = time.perf_counter() - flush_start
+        if sheet_writer.pending_count(): print(f"WARNING: {sheet_writer.pending_count()} sheet row(s) could not be written and remain in {sheet_writer.journal_path} for the next run.")
+
+    duration = time.time() - start_time
+    print(f"\nDaemon ran {job_number} job(s) in {duration:.0f} seconds ({', '.join(f'{status} {count}' for status, count in sorted(status_counts.items())) or 'none'}).")
+    API_STATS.print_summary(); run_metrics.print_phase_table()
+    run_metrics.record_run(duration, {'sheets_flush': flush_seconds}); run_metrics.write_prometheus_textfile(); run_metrics.close()
+    print(f"Daemon stopped at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}.")
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Capture screenshots and HTML of the URLs listed in the CONFIG sheet.")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help=f"Number of jobs to process concurrently (default: {MAX_WORKERS}).")
+    parser.add_argument('--no-change-detection', action='store_true', help="Upload and log every capture even if the page is unchanged.")
+    parser.add_argument('--html-archive', choices=['full', 'delta'], default=HTML_ARCHIVE_MODE, help=f"How page source is archived on Drive (default: {HTML_ARCHIVE_MODE}).")
+    parser.add_argument('--rebuild-html', metavar='FILE_ID', help="Rebuild the HTML stored in a Drive archive bundle and exit.")
+    parser.add_argument('--output', metavar='PATH', help="Where --rebuild-html writes the page source (default: stdout).")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help="Serve Prometheus-format metrics on this localhost port while running.")
+    parser.add_argument('--daemon', action='store_true', help="Keep running and capture each URL on its CONFIG 'interval' instead of once.")
+    parser.add_argument('--sync-interval', type=float, default=CONFIG_SYNC_INTERVAL, help=f"Seconds between CONFIG re-reads in daemon mode (default: {CONFIG_SYNC_INTERVAL}).")
+    args = parser.parse_args()
+    if args.rebuild_html:
+        creds = get_credentials(); drive_service, _ = build_google_services(creds, quiet=True) if creds else (None, None)
+        if not drive_service: raise SystemExit("Failed to authenticate/build Google services.")
+        html_text = rebuild_html_from_drive(drive_service, args.rebuild_html)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f: f.write(html_text)
+            print(f"Rebuilt HTML written to {args.output} ({len(html_text)} characters).")
+        else: print(html_text)
+        raise SystemExit(0)
     if not os.path.exists(TOKEN_FILE) and os.path.exists(CREDENTIALS_FILE):
          print("\n" + "="*60); print("IMPORTANT: Google Authentication Required!"); print("Looks like this is the first run or scopes/token are missing."); print(f"Ensure '{CREDENTIALS_FILE}' is present."); print("A browser window will open shortly for you to authorize access"); print("to Google Drive and Google Sheets."); print("Make sure to grant permissions for BOTH services."); print("="*60 + "\n"); time.sleep(4)
-    main()
+    if args.daemon: run_daemon(max_workers=args.workers, change_detection=CHANGE_DETECTION_ENABLED and not args.no_change_detection, html_archive_mode=args.html_archive, metrics_port=args.metrics_port, sync_interval=args.sync_interval)
+    else: main(max_workers=args.workers, change_detection=CHANGE_DETECTION_ENABLED and not args.no_change_detection, html_archive_mode=args.html_archive, metrics_port=args.metrics_port)
@@ -0,0 +1,15 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+@pytest.fixture(scope='session')
+def scraper():
+    """TrackerScraperv1.1.py loaded as a module (its file name is not importable)."""
+    spec = importlib.util.spec_from_file_location('tracker_scraper', os.path.join(REPO_DIR, 'TrackerScraperv1.1.py'))
+    module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)
+    return module
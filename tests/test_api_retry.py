@@ -0,0 +1,11 @@
+def test_retry_budget_refills_each_window(scraper, monkeypatch):
+    monkeypatch.setitem(scraper.API_RETRY_BUDGETS, 'test.endpoint', 2)
+    stats = scraper.ApiCallStats()
+    stats.record('test.endpoint', 'calls', 5)
+    assert stats.take_retry('test.endpoint') and stats.take_retry('test.endpoint') and not stats.take_retry('test.endpoint')
+    window = stats.start_window()
+    assert window['test.endpoint'] == {'calls': 5, 'throttled': 0, 'retried': 2, 'failed': 0}
+    assert stats.take_retry('test.endpoint')
+    stats.record('test.endpoint', 'calls')
+    assert stats.start_window()['test.endpoint'] == {'calls': 1, 'throttled': 0, 'retried': 1, 'failed': 0}
+    assert stats.totals() == {'calls': 6, 'throttled': 0, 'retried': 3, 'failed': 0}
@@ -0,0 +1,45 @@
+import itertools
+
+import pytest
+from googleapiclient.discovery import build
+
+import TrackerScraperBench as bench
+
+@pytest.fixture
+def fake_api(scraper, monkeypatch):
+    """The benchmark's fake Drive/Sheets server with 429s injected into roughly a quarter of requests."""
+    monkeypatch.setattr(scraper, 'API_BACKOFF_BASE', 0.001); monkeypatch.setattr(scraper, 'API_BACKOFF_MAX', 0.005)
+    monkeypatch.setattr(scraper, 'API_STATS', scraper.ApiCallStats())
+    api = bench.FakeGoogleApi(latency_ms=0, error_rate=0.25, seed=3); server = bench.start_server(bench.make_fake_api_handler(api))
+    netloc = f"127.0.0.1:{server.server_address[1]}"
+    drive = build('drive', 'v3', http=bench.LocalHttp(netloc), client_options={'api_endpoint': f"http://{netloc}/drive/v3/"}, cache_discovery=False)
+    sheets = build('sheets', 'v4', http=bench.LocalHttp(netloc), client_options={'api_endpoint': f"http://{netloc}/"}, cache_discovery=False)
+    yield api, drive, sheets
+    server.shutdown(); server.server_close()
+
+def test_sheets_round_trip_through_429s(scraper, fake_api, tmp_path):
+    api, _, sheets = fake_api
+    api.seed_config('CONFIG', [['http://site.invalid/a', 'folder1', 'Tab A'], ['http://site.invalid/b', 'folder1', "Bob's"]])
+    jobs = scraper.get_jobs_from_sheet(sheets, 'sheet-id', 'CONFIG')
+    assert [(job['url'], job['sheet_name']) for job in jobs] == [('http://site.invalid/a', 'Tab A'), ('http://site.invalid/b', "Bob's")]
+
+    registry = scraper.SheetRegistry('sheet-id', scraper.EXPECTED_HEADERS); registry.load(sheets); registry.prepare(sheets, ['Tab A', "Bob's"])
+    buffer = scraper.SheetRowBuffer('sheet-id', registry, journal_path=str(tmp_path / 'pending.jsonl'))
+    assert buffer.add_row(sheets, 'Tab A', ['t1', 'link1', 'ok']) and buffer.add_row(sheets, "Bob's", ['t2', 'link2', 'ok'])
+    buffer.flush(sheets)
+    assert not buffer.pending_sheet_names()
+    assert api.tabs['Tab A'] == [scraper.EXPECTED_HEADERS, ['t1', 'link1', 'ok']]
+    assert api.tabs["Bob's"] == [scraper.EXPECTED_HEADERS, ['t2', 'link2', 'ok']]
+    assert sum(counts['injected_429'] for counts in api.counters.values()) > 0
+
+def test_multipart_and_resumable_uploads_through_429s(scraper, fake_api):
+    api, drive, _ = fake_api
+    throttle = itertools.chain([True, False, True, False, True], itertools.repeat(False)) # 429 on the multipart POST, the resumable session start and the first chunk
+    api.should_throttle = lambda: next(throttle)
+    small = b'x' * 1000; large = b'y' * (scraper.DRIVE_RESUMABLE_UPLOAD_THRESHOLD + 1024)
+    small_id, _ = scraper.upload_bytes_to_drive(drive, small, 'small.jpg', 'folder1', 'image/jpeg')
+    large_id, _ = scraper.upload_bytes_to_drive(drive, large, 'large.html', 'folder1', 'text/html')
+    assert api.files[small_id] == {'name': 'small.jpg', 'parents': ['folder1'], 'size': len(small)}
+    assert api.files[large_id] == {'name': 'large.html', 'parents': ['folder1'], 'size': len(large)}
+    assert len(api.uploads) == 1
+    assert {endpoint: counts['injected_429'] for endpoint, counts in api.counters.items()} == {'drive.files.create': 2, 'drive.files.upload_chunk': 1}
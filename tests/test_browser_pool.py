@@ -0,0 +1,63 @@
+import itertools
+
+class FakeSwitchTo:
+    def __init__(self, driver): self.driver = driver
+    def window(self, handle):
+        assert handle in self.driver.targets; self.driver.current_window_handle = handle
+    def new_window(self, kind): self.window(self.driver.execute_cdp_cmd('Target.createTarget', {})['targetId'])
+
+class FakeDriver:
+    """Tracks CDP browser contexts and the per-context storage a page leaves behind."""
+
+    def __init__(self, isolation=True):
+        self.isolation = isolation; self.ids = itertools.count(1)
+        self.targets = {'home': None}; self.current_window_handle = 'home'; self.storage = {None: set()}
+        self.switch_to = FakeSwitchTo(self); self.quit_called = False
+
+    @property
+    def window_handles(self): return list(self.targets)
+
+    def visit(self, origin): self.storage[self.targets[self.current_window_handle]].add(origin)
+
+    def execute_cdp_cmd(self, cmd, params):
+        if cmd == 'Target.createBrowserContext':
+            if not self.isolation: raise RuntimeError('not supported')
+            context_id = f"ctx{next(self.ids)}"; self.storage[context_id] = set(); return {'browserContextId': context_id}
+        if cmd == 'Target.createTarget':
+            target_id = f"tab{next(self.ids)}"; self.targets[target_id] = params.get('browserContextId'); return {'targetId': target_id}
+        if cmd == 'Target.disposeBrowserContext':
+            context_id = params['browserContextId']; assert self.targets[self.current_window_handle] != context_id
+            self.targets = {h: c for h, c in self.targets.items() if c != context_id}; del self.storage[context_id]; return {}
+        if cmd == 'Page.getFrameTree': return {'frameTree': {'frame': {'url': ''}}}
+        if cmd in ('Network.clearBrowserCookies', 'Network.clearBrowserCache'): self.storage[None].clear(); return {}
+        return {}
+
+    def close(self): del self.targets[self.current_window_handle]
+    def execute_script(self, script): return 1
+    def set_window_size(self, width, height): pass
+    def quit(self): self.quit_called = True
+
+def test_each_job_gets_its_own_browser_context(scraper, monkeypatch):
+    drivers = []
+    monkeypatch.setattr(scraper, 'create_chrome_driver', lambda: drivers.append(FakeDriver()) or drivers[-1])
+    pool = scraper.BrowserPool(size=1, max_pages_per_driver=10)
+    driver = pool.acquire(); first_context = driver.targets[driver.current_window_handle]
+    assert first_context is not None
+    driver.visit('https://tracker.example'); driver.visit('https://cdn.example')
+    pool.release(driver)
+    assert driver.window_handles == ['home'] and first_context not in driver.storage and driver.storage[None] == set()
+
+    again = pool.acquire()
+    assert again is driver and driver.targets[driver.current_window_handle] not in (None, first_context)
+    assert driver.storage[driver.targets[driver.current_window_handle]] == set()
+    pool.release(again); pool.close()
+    assert pool.drivers_launched == 1 and pool.drivers_recycled == 0
+
+def test_falls_back_to_clearing_default_context(scraper, monkeypatch):
+    monkeypatch.setattr(scraper, 'create_chrome_driver', lambda: FakeDriver(isolation=False))
+    pool = scraper.BrowserPool(size=1, max_pages_per_driver=10)
+    driver = pool.acquire()
+    assert driver.targets[driver.current_window_handle] is None
+    driver.visit('https://tracker.example')
+    pool.release(driver)
+    assert driver.storage[None] == set() and len(driver.window_handles) == 1 and pool.drivers_recycled == 0
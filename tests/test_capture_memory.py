@@ -0,0 +1,15 @@
+import threading
+import time
+
+def test_rss_peak_sampler_sees_allocation_and_ignores_other_threads(scraper):
+    baseline = scraper.RssPeakSampler().start(); baseline_peak = baseline.stop()
+    if baseline_peak is None: return # No /proc or getrusage on this platform
+    release = threading.Event()
+    def other_worker():
+        other = scraper.RssPeakSampler().start(); release.wait(); other.stop() # Starting/stopping elsewhere must not affect ours
+    thread = threading.Thread(target=other_worker); thread.start()
+    sampler = scraper.RssPeakSampler(interval=0.01).start()
+    block = bytearray(64 * 1024 * 1024); block[::4096] = b'x' * len(block[::4096]); time.sleep(0.05); del block
+    release.set(); thread.join(); peak = sampler.stop()
+    assert peak >= baseline_peak + 48 * 1024 * 1024
+    assert sampler.stop() == peak
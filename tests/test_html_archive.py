@@ -0,0 +1,41 @@
+import time
+
+def make_page(rows, heading='Results'):
+    items = ''.join(f"<div class='row'><span class='name'>Item {i}</span><span class='price'>${i % 97}.99</span></div>\n" for i in range(rows))
+    return f"<html><head><title>Shop</title></head><body><h1>{heading}</h1><div id='list'>{items}</div></body></html>"
+
+def test_delta_round_trip(scraper):
+    parent = make_page(200); child = make_page(200, heading='Results (updated)').replace('Item 50<', 'Item fifty<').replace("<div class='row'><span class='name'>Item 120", "<div class='row new'><span class='name'>Item 120")
+    child += '<footer>new footer</footer>'
+    ops = scraper.compute_html_delta(parent, child)
+    assert scraper.apply_html_delta(parent, ops) == child
+    assert sum(len(op[1]) for op in ops if op[0] == 'i') < len(child) // 10
+
+def test_delta_edge_cases(scraper):
+    for parent, child in [('', '<p>a</p>'), ('<p>a</p>', ''), ('<p>a</p>', '<p>a</p>'), ('x>y>z>', 'z>y>x>'), ('<a>\n' * 50, '<a>\n' * 10 + '<b>\n' + '<a>\n' * 60)]:
+        assert scraper.apply_html_delta(parent, scraper.compute_html_delta(parent, child)) == child
+
+def test_delta_is_fast_on_large_repetitive_pages(scraper):
+    parent = make_page(12000); child = make_page(12000, heading='Changed') # About 1 MB of near-identical, highly repetitive markup
+    start = time.perf_counter(); ops = scraper.compute_html_delta(parent, child); elapsed = time.perf_counter() - start
+    assert scraper.apply_html_delta(parent, ops) == child
+    assert elapsed < 3.0, f"compute_html_delta took {elapsed:.1f}s on {len(child)} characters"
+
+def test_rebuild_html_replays_chain(scraper):
+    versions = [make_page(300, heading=f'Version {n}') for n in range(4)]; store = {}
+    store['f0'] = scraper.encode_html_bundle({'format': scraper.HTML_ARCHIVE_FORMAT, 'kind': 'snapshot', 'chain': [], 'sha256': scraper.hashlib.sha256(versions[0].encode()).hexdigest()}, versions[0])
+    for n in range(1, 4):
+        header = {'format': scraper.HTML_ARCHIVE_FORMAT, 'kind': 'delta', 'chain': [f'f{k}' for k in range(n)], 'sha256': scraper.hashlib.sha256(versions[n].encode()).hexdigest()}
+        store[f'f{n}'] = scraper.encode_html_bundle(header, scraper.compute_html_delta(versions[n - 1], versions[n]))
+    for n in range(4): assert scraper.rebuild_html(store.__getitem__, f'f{n}') == versions[n]
+
+def test_html_archive_builds_snapshot_then_deltas(scraper, tmp_path):
+    archive = scraper.HtmlArchive(db_path=str(tmp_path / 'archive.sqlite3'), snapshot_every=3); store = {}
+    try:
+        for n in range(5):
+            html = make_page(300, heading=f'Version {n}')
+            bundle, state = archive.build_bundle('http://example.test/', html, f'2026-01-0{n + 1}')
+            store[f'f{n}'] = bundle; archive.commit(state, f'f{n}')
+            assert scraper.rebuild_html(store.__getitem__, f'f{n}') == html
+            assert scraper.decode_html_bundle(bundle)['kind'] == ('snapshot' if n % 3 == 0 else 'delta')
+    finally: archive.close()
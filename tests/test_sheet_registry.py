@@ -0,0 +1,60 @@
+import json
+
+class FakeRequest:
+    def __init__(self, handler, kwargs): self.handler = handler; self.kwargs = kwargs
+    def execute(self): return self.handler(**self.kwargs)
+
+class FakeError(Exception): pass
+
+class FakeSheetsService:
+    """Just enough of the Sheets client for SheetRegistry/SheetRowBuffer. Titles compare case-insensitively, like Sheets."""
+
+    def __init__(self, titles, scraper, rejected=()):
+        self.scraper = scraper; self.tabs = {title: [] for title in titles}; self.rejected = set(rejected); self.calls = []
+
+    def _find(self, a1):
+        title = a1.split('!')[0].strip("'").replace("''", "'")
+        return next(t for t in self.tabs if t.casefold() == title.casefold())
+
+    def _error(self, message):
+        resp = type('Resp', (), {'status': 400, 'reason': 'Bad Request'})()
+        return self.scraper.HttpError(resp, json.dumps({'error': {'message': message}}).encode())
+
+    def spreadsheets(self): return self
+    def values(self): return self
+
+    def get(self, spreadsheetId, fields=None):
+        return FakeRequest(lambda: {'sheets': [{'properties': {'title': t}} for t in self.tabs]}, {})
+
+    def batchUpdate(self, spreadsheetId, body):
+        def run():
+            self.calls.append('batchUpdate')
+            if 'requests' in body:
+                titles = [r['addSheet']['properties']['title'] for r in body['requests']]
+                for title in titles:
+                    if title in self.rejected or any(t.casefold() == title.casefold() for t in self.tabs): raise self._error(f"Invalid sheet name '{title}'")
+                for title in titles: self.tabs[title] = []
+            else:
+                for data in body['data']: self.tabs[self._find(data['range'])][:1] = [data['values'][0]]
+            return {}
+        return FakeRequest(run, {})
+
+    def batchGet(self, spreadsheetId, ranges):
+        return FakeRequest(lambda: {'valueRanges': [{'values': self.tabs[self._find(r)][:1]} for r in ranges]}, {})
+
+    def append(self, spreadsheetId, range, valueInputOption, insertDataOption, body):
+        return FakeRequest(lambda: self.tabs[self._find(range)].extend(body['values']) or {}, {})
+
+def test_bad_tab_does_not_block_other_tabs(scraper, tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, 'API_MAX_ATTEMPTS', 1)
+    service = FakeSheetsService(['dup', 'Existing'], scraper, rejected={'Bad/Name'})
+    registry = scraper.SheetRegistry('sid', scraper.EXPECTED_HEADERS)
+    ready = registry.prepare(service, ['Good', 'Dup', 'Bad/Name', 'Existing'])
+    assert ready == {'Good', 'Dup', 'Existing'}
+    assert service.tabs['dup'][0] == scraper.EXPECTED_HEADERS and 'Dup' not in service.tabs # Case-insensitive match, no duplicate tab
+    writer = scraper.SheetRowBuffer('sid', registry, journal_path=str(tmp_path / 'journal.jsonl'))
+    for name in ['Good', 'Dup', 'Bad/Name']: assert writer.add_row(service, name, ['t', 'i', 'h'])
+    assert writer.flush(service) == 2
+    assert service.tabs['Good'][1:] == [['t', 'i', 'h']] and service.tabs['dup'][1:] == [['t', 'i', 'h']]
+    assert writer.pending_sheet_names() == {'Bad/Name'}
+    assert [json.loads(line)['sheet_name'] for line in open(tmp_path / 'journal.jsonl')] == ['Bad/Name']